@@ -5,6 +5,7 @@ from pathlib import Path
 from contextlib import chdir
 
 from utils.utils import path_config, command_config, clean_filename
+from utils.scan import extensions, scan, walk
 
 
 __version__ = '0.2.0'
@@ -29,9 +30,6 @@ def compress_files(extension: str, input_path: Path, added_path: Path, name: str
     Scan for files having a specific extension and compress them to the tar.gz format
     for easier archiving. One compressed file will be generated per folder.
     """
-    def _is_valid(file_: str) -> bool:
-        return file_.lower().endswith(f'.{extension.lower()}')
-
     def _scan_and_compress(folder_path_: Path, datalist: list[str], output_file_: str) -> int:
         total = 0
         if datalist:
@@ -67,16 +65,13 @@ def compress_files(extension: str, input_path: Path, added_path: Path, name: str
         pass
 
     count = 0
+    exts = extensions([extension])
     for path in [input_path, *list(added_path)]:        # noqa
         if recursive:
-            for current_folder, dirnames, files in os.walk(path):
-                folder_path = Path(current_folder)
-                if not hidden and os.path.basename(folder_path).startswith("."):
-                    continue
-                valid_files = [i for i in files if _is_valid(i)]
-                count += _scan_and_compress(folder_path, valid_files, output_file)
+            for current_folder, _, files in walk(path, exts, hidden=hidden):
+                count += _scan_and_compress(Path(current_folder), [i.name for i in files], output_file)
         else:
-            if valid_files := [i for i in os.listdir(path) if _is_valid(i)]:
+            if valid_files := [i.name for i in scan(path, exts, recursive=False, hidden=hidden)]:
                 count += _scan_and_compress(path, valid_files, output_file)
             else:
                 click.echo(f'No {extension.upper()} files found.')
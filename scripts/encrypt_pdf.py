@@ -1,31 +1,50 @@
 #!/usr/bin/env python3
 
 import click
-import getpass
-from PyPDF2 import PdfReader, PdfWriter
+
+from utils.pdfstream import ALGORITHMS, find_pdfs, encrypt_file, run_batch, read_password, write_report
 
 
 @click.command()
-@click.argument('pdf_path', type=click.Path(exists=True, dir_okay=False, readable=True, writable=True))
-def main(pdf_path):
-    """Encrypt a PDF with a password."""
-    password = getpass.getpass("Enter password: ")
+@click.argument('paths', nargs=-1, required=True)
+@click.option('--recursive', '-r', is_flag=True, help='Search folders and ** globs recursively')
+@click.option('--algorithm', '-a', type=click.Choice(list(ALGORITHMS), case_sensitive=False), default='RC4-128',
+              show_default=True, help='Encryption strength. AES-256 needs PyCryptodome')
+@click.option('--workers', '-w', type=click.IntRange(min=1, max=64), default=4, show_default=True,
+              help='Number of PDFs processed at the same time')
+@click.option('--password-fd', type=int, help='Read the password from this file descriptor instead of prompting')
+@click.option('--report', type=click.Path(dir_okay=False, writable=True), help='Write a CSV result per file')
+def main(paths, recursive, algorithm, workers, password_fd, report):
+    """Encrypt PDFs with a password. PATHS can be files, folders or glob patterns."""
+    pdfs = find_pdfs(paths, recursive)
+    if not pdfs:
+        click.echo("No PDF files found.", err=True)
+        return
+
+    password = read_password("Enter password: ", password_fd)
     if not password.strip():
         click.echo("Password cannot be empty.", err=True)
         return
 
-    # Check if valid PDF and apply encryption
-    try:
-        reader = PdfReader(pdf_path)
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
-        writer.encrypt(password)
-        with open(pdf_path, "wb") as output_pdf:
-            writer.write(output_pdf)
-        click.echo("PDF encrypted successfully.")
-    except Exception as e:
-        click.echo(f"Error: {e}", err=True)
+    # Key derivation happens here once, for AES-256 the workers reuse it for every file
+    encryption = ALGORITHMS[algorithm.upper()](password)
+
+    # Each file streams into a temp file that replaces the original only once fully written
+    results = {}
+    for result in run_batch(encrypt_file, [(i, encryption) for i in pdfs], workers):
+        results[result['path']] = result
+        if result['status'] == 'failed':
+            click.echo(f"Error: {result['path']}: {result['error']}", err=True)
+        else:
+            click.echo(f"Encrypted: {result['path']}")
+
+    if report:
+        write_report(report, [results[i] for i in pdfs])
+    failed = sum(i['status'] == 'failed' for i in results.values())
+    click.echo("PDF encrypted successfully." if len(pdfs) == 1 and not failed else
+               f"Encrypted {len(pdfs) - failed} of {len(pdfs)} PDF(s).")
+    if failed:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
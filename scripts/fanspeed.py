@@ -4,16 +4,28 @@ import os
 import sys
 import time
 import fcntl
+import signal
 import logging
 import sqlite3
+import bisect
 import argparse
+import configparser
+import threading
 import subprocess
+from abc import ABC, abstractmethod
 from pathlib import Path
+from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict
 
 import sqlalchemy as sa
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import declarative_base
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
 
 
 # Speed modifiers
@@ -39,6 +51,7 @@ CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = CONFIG_DIR / 'fanspeed.db'
 LOG_PATH = CONFIG_DIR / f'{APPNAME}.log'
 LOCK_FILE = CONFIG_DIR / f'{APPNAME}.lock'
+CONFIG_PATH = CONFIG_DIR / 'fanspeed.ini'
 
 # Configure logging
 logging.basicConfig(
@@ -59,21 +72,95 @@ class FanSpeedLog(Base):
     fan_speed = sa.Column(sa.Integer)
 
 
-def create_engine_and_session():
-    engine = sa.create_engine(f'sqlite:///{DB_PATH}')
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return engine, Session()
-
-
-def log_fan_data(temperature: float, fan_speed: int):
-    try:
-        _, session = create_engine_and_session()
-        log_entry = FanSpeedLog(temperature=temperature, fan_speed=fan_speed)
-        session.add(log_entry)
-        session.commit()
-    except SQLAlchemyError as e:
-        logging.error(f"Database logging error: {e}")
+class FanSpeedRollup(Base):
+    __tablename__ = 'fan_speed_rollups'
+    hour = sa.Column(sa.String(19), primary_key=True)
+    samples = sa.Column(sa.Integer)
+    avg_temperature = sa.Column(sa.Float)
+    max_temperature = sa.Column(sa.Float)
+    avg_fan_speed = sa.Column(sa.Float)
+
+
+def _set_sqlite_pragmas(dbapi_conn, _):
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+class FanDataLogger:
+    """
+    Single engine for the whole run. Samples are buffered in memory and written with one executemany insert once
+    `batch_size` samples are queued or `flush_interval` seconds have passed. Raw rows older than `keep_hours` are
+    periodically folded into hourly rollups and deleted.
+    """
+
+    def __init__(self, db_path: Path = DB_PATH, batch_size: int = 60, flush_interval: float = 60,
+                 keep_hours: int = 24, rollup_interval: float = 3600):
+        self.engine = sa.create_engine(f'sqlite:///{db_path}')
+        sa.event.listen(self.engine, 'connect', _set_sqlite_pragmas)
+        Base.metadata.create_all(self.engine)
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.keep_hours = keep_hours
+        self.rollup_interval = rollup_interval
+        self.buffer: list[dict] = []
+        self.last_flush = self.last_rollup = time.monotonic()
+
+    def log(self, temperature: float, fan_speed: int):
+        self.buffer.append(dict(timestamp=datetime.now(), temperature=temperature, fan_speed=fan_speed))
+        now = time.monotonic()
+        if len(self.buffer) >= self.batch_size or now - self.last_flush >= self.flush_interval:
+            self.flush()
+        if now - self.last_rollup >= self.rollup_interval:
+            self.rollup()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(sa.insert(FanSpeedLog), self.buffer)
+            self.buffer.clear()
+        except SQLAlchemyError as e:
+            logging.error(f"Database logging error: {e}")
+
+    def rollup(self):
+        """Aggregate whole hours older than keep_hours into fan_speed_rollups and drop the raw rows."""
+        self.last_rollup = time.monotonic()
+        cutoff = (datetime.now() - timedelta(hours=self.keep_hours)).replace(minute=0, second=0, microsecond=0)
+        hour = sa.func.strftime('%Y-%m-%d %H:00:00', FanSpeedLog.timestamp)
+        stmt = (
+            sa.select(hour, sa.func.count(), sa.func.avg(FanSpeedLog.temperature),
+                      sa.func.max(FanSpeedLog.temperature), sa.func.avg(FanSpeedLog.fan_speed))
+            .where(FanSpeedLog.timestamp < cutoff)
+            .group_by(hour)
+        )
+        try:
+            with self.engine.begin() as conn:
+                rows = [dict(hour=h, samples=n, avg_temperature=avg_t, max_temperature=max_t, avg_fan_speed=avg_f)
+                        for h, n, avg_t, max_t, avg_f in conn.execute(stmt)]
+                if not rows:
+                    return
+
+                insert = sqlite_insert(FanSpeedRollup)
+                old, new = FanSpeedRollup, insert.excluded
+                total = old.samples + new.samples
+                conn.execute(insert.on_conflict_do_update(index_elements=['hour'], set_=dict(
+                    samples=total,
+                    avg_temperature=(old.avg_temperature * old.samples + new.avg_temperature * new.samples) / total,
+                    max_temperature=sa.func.max(old.max_temperature, new.max_temperature),
+                    avg_fan_speed=(old.avg_fan_speed * old.samples + new.avg_fan_speed * new.samples) / total,
+                )), rows)
+                conn.execute(sa.delete(FanSpeedLog).where(FanSpeedLog.timestamp < cutoff))
+        except SQLAlchemyError as e:
+            logging.error(f"Database rollup error: {e}")
+
+    def close(self):
+        self.flush()
+        self.engine.dispose()
 
 
 def get_gpu_temperature() -> Optional[float]:
@@ -91,98 +178,441 @@ def get_gpu_temperature() -> Optional[float]:
 def parse_arguments():
     parser = argparse.ArgumentParser(description='NVIDIA GPU Fan Speed Control')
     parser.add_argument('-V', '--version', action='version', version='1.0.0')
-    parser.add_argument('-d', '--detach', action='store_true', help='Run in background')
-    # parser.add_argument('-s', '--speed', choices=['low', 'medium', 'high'], default='medium')
-    # parser.add_argument('-m', '--max', type=int, default=90, help='Maximum fan speed')
-    parser.add_argument('-c', '--cooldown', type=int, default=10, help='Cooldown between adjustments')
+    parser.add_argument('-d', '--detach', action='store_true',
+                        help='Run in background. SIGHUP reloads the fan curve, SIGTERM restores auto mode and exits')
+    parser.add_argument('-s', '--speed', choices=['low', 'medium', 'high'], default='medium', help='Fan curve profile')
+    parser.add_argument('-m', '--max', type=int, default=90, help='Maximum fan speed')
+    parser.add_argument('-c', '--cooldown', type=float, default=10,
+                        help='Longest wait between readings while the temperature is stable')
+    parser.add_argument('--min-interval', type=float, default=1,
+                        help='Shortest wait between readings near a curve point')
     parser.add_argument('--dry-run', action='store_true', help='Check temperature without changing fan speed')
     parser.add_argument('--no-delete', action='store_true', help='Prevent database deletion')
     parser.add_argument('--no-notify', action='store_true', help='Disable system notifications')
+    parser.add_argument('-b', '--backend', choices=['auto', *BACKENDS], default='auto',
+                        help='Sensor and fan control backend')
 
     return parser.parse_args()
 
 
-def set_fan_speed(speed: int):
+def set_fan_speed(speed: int) -> bool:
     try:
         subprocess.run(
             ['nvidia-settings', '-a', '[gpu:0]/GPUFanControlState=1', '-a', f'[fan:0]/GPUTargetFanSpeed={speed}'],
             check=True
         )
         logging.info(f"Fan speed set to {speed}%")
-    except subprocess.CalledProcessError as e:
+        return True
+    except (subprocess.CalledProcessError, OSError) as e:
         logging.error(f"Fan speed setting error: {e}")
+        return False
 
 
-def set_fan_speed_auto():
+def set_fan_speed_auto() -> bool:
     """Set the GPU fan speed to auto mode."""
     try:
-        subprocess.run(["nvidia-settings", "-a", "[fan:0]/GPUTargetFanSpeed=0"], check=True)
+        subprocess.run(["nvidia-settings", "-a", "[gpu:0]/GPUFanControlState=0"], check=True)
         print("Fan speed set to auto mode.")
-    except subprocess.CalledProcessError as e:
+        return True
+    except (subprocess.CalledProcessError, OSError) as e:
         print(f"Failed to set fan speed to auto mode: {e}", file=sys.stderr)
-        sys.exit(1)
+        logging.error(f"Fan auto mode error: {e}")
+        return False
 
 
-def calculate_fan_speed(temp: float) -> int:
-    """Calculate fan speed based on temperature and speed profile"""
+class FanBackend(ABC):
+    """
+    Reads the GPU temperature and applies fan speeds. Writes are skipped when the speed has not changed and a
+    failed write is retried on the next tick.
+    """
+    name = 'base'
 
-    sorted_keys = sorted(TEMP_FAN_MAPPING.keys())
+    def __init__(self):
+        self.current: Optional[int] = None
 
-    for idx, lower_key in enumerate(sorted_keys):
-        last_idx = len(sorted_keys) - 1
-        upper_key = sorted_keys[idx + 1] if idx < last_idx else None
+    @abstractmethod
+    def get_temperature(self) -> Optional[float]:
+        ...
 
-        if idx == 0 and temp < lower_key:
-            return -1
-        elif idx == last_idx and temp >= sorted_keys[-1]:
-            return TEMP_FAN_MAPPING[sorted_keys[-1]]
-        elif lower_key <= temp < upper_key:
-            return TEMP_FAN_MAPPING[lower_key]
-        else:
+    @abstractmethod
+    def _apply(self, speed: int) -> bool:
+        ...
+
+    @abstractmethod
+    def _apply_auto(self) -> bool:
+        ...
+
+    def can_control(self) -> bool:
+        """Whether this backend is allowed to change fan speeds here"""
+        return True
+
+    def set_speed(self, speed: int):
+        """Apply a speed in percent, -1 hands control back to the driver."""
+        if speed == self.current:
+            return
+        if self._apply_auto() if speed == -1 else self._apply(speed):
+            self.current = speed
+
+    def close(self):
+        pass
+
+
+class NvmlBackend(FanBackend):
+    """Keeps one NVML handle open for the whole run so every tick is a library call, not a process."""
+    name = 'nvml'
+
+    def __init__(self, index: int = 0):
+        super().__init__()
+        if pynvml is None:
+            raise RuntimeError('pynvml is not installed')
+        pynvml.nvmlInit()
+        self.handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+        self.fans = range(pynvml.nvmlDeviceGetNumFans(self.handle))
+
+    def get_temperature(self) -> Optional[float]:
+        try:
+            return float(pynvml.nvmlDeviceGetTemperature(self.handle, pynvml.NVML_TEMPERATURE_GPU))
+        except pynvml.NVMLError as e:
+            logging.error(f"Temperature retrieval error: {e}")
+            return None
+
+    def _apply(self, speed: int) -> bool:
+        try:
+            for fan in self.fans:
+                pynvml.nvmlDeviceSetFanSpeed_v2(self.handle, fan, speed)
+            logging.info(f"Fan speed set to {speed}%")
+            return True
+        except pynvml.NVMLError as e:
+            logging.error(f"Fan speed setting error: {e}")
+            return False
+
+    def _apply_auto(self) -> bool:
+        try:
+            for fan in self.fans:
+                pynvml.nvmlDeviceSetDefaultFanSpeed_v2(self.handle, fan)
+            return True
+        except pynvml.NVMLError as e:
+            logging.error(f"Fan auto mode error: {e}")
+            return False
+
+    def can_control(self) -> bool:
+        """NVML fan writes need root. Handing the fans to the driver is a harmless write to find out."""
+        try:
+            for fan in self.fans:
+                pynvml.nvmlDeviceSetDefaultFanSpeed_v2(self.handle, fan)
+            return True
+        except pynvml.NVMLError as e:
+            logging.info(f"NVML cannot set fan speeds: {e}")
+            return False
+
+    def close(self):
+        pynvml.nvmlShutdown()
+
+
+class NvidiaSmiBackend(FanBackend):
+    """
+    One long-lived `nvidia-smi -lms` co-process streams readings and a reader thread keeps the latest one, so a tick
+    costs nothing. Speeds are still applied through nvidia-settings, but only when they change.
+    """
+    name = 'nvidia-smi'
+
+    def __init__(self, interval_ms: int = 1000):
+        super().__init__()
+        self.latest: Optional[float] = None
+        self.ready = threading.Event()
+        self.proc = subprocess.Popen(
+            ['nvidia-smi', '--query-gpu=temperature.gpu', '--format=csv,noheader,nounits', f'-lms={interval_ms}'],
+            stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            try:
+                self.latest = float(line.split(',')[0])
+            except ValueError:
+                continue
+            self.ready.set()
+        self.latest = None
+
+    def get_temperature(self) -> Optional[float]:
+        self.ready.wait(timeout=5)
+        return self.latest
+
+    def _apply(self, speed: int) -> bool:
+        return set_fan_speed(speed)
+
+    def _apply_auto(self) -> bool:
+        return set_fan_speed_auto()
+
+    def close(self):
+        self.proc.terminate()
+        self.proc.wait()
+
+
+class NvidiaSettingsBackend(FanBackend):
+    """Original one-process-per-call path, for systems without NVML or nvidia-smi."""
+    name = 'nvidia-settings'
+
+    def get_temperature(self) -> Optional[float]:
+        return get_gpu_temperature()
+
+    def _apply(self, speed: int) -> bool:
+        return set_fan_speed(speed)
+
+    def _apply_auto(self) -> bool:
+        return set_fan_speed_auto()
+
+
+class FakeBackend(FanBackend):
+    """Replays a list of temperatures and records every applied speed. Returns None once exhausted."""
+    name = 'fake'
+
+    def __init__(self, temperatures: Optional[list[float]] = None):
+        super().__init__()
+        self.temperatures = iter(temperatures if temperatures is not None else [40.0, 60.0, 75.0, 85.0, 50.0])
+        self.applied: list[int] = []
+
+    def get_temperature(self) -> Optional[float]:
+        return next(self.temperatures, None)
+
+    def _apply(self, speed: int) -> bool:
+        self.applied.append(speed)
+        return True
+
+    def _apply_auto(self) -> bool:
+        self.applied.append(-1)
+        return True
+
+
+BACKENDS = {i.name: i for i in (NvmlBackend, NvidiaSmiBackend, NvidiaSettingsBackend, FakeBackend)}
+
+
+def create_backend(name: str, control: bool = True) -> FanBackend:
+    """
+    Instantiate a backend by name. "auto" picks the cheapest one that works on this machine and, when `control`
+    is set, is also allowed to change the fan speed.
+    """
+    if name != 'auto':
+        return BACKENDS[name]()
+
+    for backend in (NvmlBackend, NvidiaSmiBackend):
+        try:
+            instance = backend()
+        except Exception as e:
+            logging.info(f"{backend.name} backend unavailable: {e}")
             continue
+        if not control or instance.can_control():
+            return instance
+        instance.close()
+    return NvidiaSettingsBackend()
+
+
+class FanCurve:
+    """
+    Fan curve with linear interpolation between points, found with a bisect instead of a scan.
+    Calling the curve is stateful: speed only drops once the temperature has fallen `hysteresis` degrees below the
+    peak reading since the last drop, and each call moves at most `ramp` percentage points (0 disables). Increases
+    are never held back by the hysteresis.
+    -1 means the temperature is below the curve and the driver should control the fan.
+    """
+
+    def __init__(self, points: Dict[float, int], hysteresis: float = 2.0, ramp: int = 10, max_speed: int = 100):
+        self.temps = sorted(points)
+        self.speeds = [min(points[i], max_speed) for i in self.temps]
+        self.hysteresis = hysteresis
+        self.ramp = ramp
+        self.anchor: Optional[float] = None
+        self.speed: Optional[int] = None
+
+    def target(self, temp: float) -> int:
+        """Stateless curve value"""
+        if temp < self.temps[0]:
+            return -1
+        if temp >= self.temps[-1]:
+            return self.speeds[-1]
+        idx = bisect.bisect_right(self.temps, temp) - 1
+        t0, t1 = self.temps[idx], self.temps[idx + 1]
+        s0, s1 = self.speeds[idx], self.speeds[idx + 1]
+        return round(s0 + (s1 - s0) * (temp - t0) / (t1 - t0))
+
+    def __call__(self, temp: float) -> int:
+        target = self.target(temp)
+        # Hysteresis only ever blocks a decrease. A higher target is always stepped towards, however close to the
+        # last peak the temperature is.
+        if (self.speed is not None and self.anchor is not None and temp > self.anchor - self.hysteresis
+                and self.speed >= target):
+            self.anchor = max(self.anchor, temp)
+            return self.speed
+
+        decreasing = self.speed is not None and target < self.speed
+        curve_target = target
+        if self.speed not in (None, -1) and target != -1 and self.ramp:
+            target = max(self.speed - self.ramp, min(self.speed + self.ramp, target))
+
+        if self.anchor is None or not decreasing:
+            self.anchor = temp if self.anchor is None else max(self.anchor, temp)
+        elif target == curve_target:
+            # Fully dropped, the next decrease needs another `hysteresis` degrees. Mid-ramp keeps the old peak.
+            self.anchor = temp
+        self.speed = target
+        return target
+
+
+def load_curve(profile: str = 'medium', max_speed: int = 100) -> FanCurve:
+    """
+    Build the curve for a profile. Points come from a [profile:<name>] section in fanspeed.ini (temperature = speed)
+    and hysteresis/ramp from its [curve] section. Without a config the low and high profiles are the medium
+    mapping scaled by the speed modifiers.
+    """
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+
+    section = f'profile:{profile}'
+    if config.has_section(section):
+        points = {float(k): int(v) for k, v in config.items(section)}
+    else:
+        modifier = {'low': 1 - SPEED_LOW_MOD, 'high': 1 + SPEED_HIGH_MOD}.get(profile, 1)
+        points = {k: round(v * modifier) for k, v in TEMP_FAN_MAPPING.items()}
+
+    return FanCurve(points, hysteresis=config.getfloat('curve', 'hysteresis', fallback=2.0),
+                    ramp=config.getint('curve', 'ramp', fallback=10), max_speed=max_speed)
+
+
+DEFAULT_CURVE = FanCurve(TEMP_FAN_MAPPING)
+
+
+def calculate_fan_speed(temp: float) -> int:
+    """Calculate fan speed based on temperature and speed profile"""
+    return DEFAULT_CURVE.target(temp)
+
+
+class AdaptivePoller:
+    """
+    Chooses how long to sleep before the next reading. Far from every curve point and steady, it waits the full
+    `max_interval`. Near a point, or heading towards one, it polls often enough to catch the crossing.
+    """
+
+    def __init__(self, breakpoints: list[float], min_interval: float = 1.0, max_interval: float = 10.0,
+                 margin: float = 2.0):
+        self.breakpoints = sorted(breakpoints)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.margin = margin
+        self.last_temp: Optional[float] = None
+        self.last_time: Optional[float] = None
+
+    def next_interval(self, temp: float) -> float:
+        now = time.monotonic()
+        rate = 0.0
+        if self.last_temp is not None and now > self.last_time:
+            rate = (temp - self.last_temp) / (now - self.last_time)
+        self.last_temp, self.last_time = temp, now
+
+        idx = bisect.bisect_left(self.breakpoints, temp)
+        above = self.breakpoints[idx] - temp if idx < len(self.breakpoints) else float('inf')
+        below = temp - self.breakpoints[idx - 1] if idx else float('inf')
+        if min(above, below) <= self.margin:
+            return self.min_interval
+
+        # Time until the point we are heading towards is reached, polled at twice that rate
+        distance = above if rate > 0 else below if rate < 0 else float('inf')
+        if rate:
+            return max(self.min_interval, min(self.max_interval, distance / abs(rate) / 2))
+        return self.max_interval
+
+
+def daemonize():
+    """Classic double fork so the process is detached from the terminal and cannot reacquire one."""
+    if os.fork():
+        os._exit(0)
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+
+    os.chdir('/')
+    os.umask(0o022)
+    with open(os.devnull, 'r+b') as devnull:
+        for fd in (0, 1, 2):
+            os.dup2(devnull.fileno(), fd)
 
 
 def main():
-    # Ensure single instance
+    args = parse_arguments()
+
+    # Ensure single instance. Taken before detaching so a second --detach fails in the foreground, the daemon
+    # inherits the locked descriptor and keeps the lock once the parent exits.
     with open(LOCK_FILE, 'w') as lock_file:
         try:
             fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
         except (IOError, BlockingIOError):
             logging.error("Another instance is already running.")
+            print("Another instance is already running.", file=sys.stderr)
             sys.exit(1)
 
-        try:
-            args = parse_arguments()
+        if args.detach:
+            daemonize()
+
+        stop, reload, wake = threading.Event(), threading.Event(), threading.Event()
+
+        def _on_stop(signum, _):
+            logging.info(f"Received {signal.Signals(signum).name}, shutting down")
+            stop.set()
+            wake.set()
+
+        def _on_reload(*_):
+            reload.set()
+            wake.set()
 
+        signal.signal(signal.SIGTERM, _on_stop)
+        signal.signal(signal.SIGINT, _on_stop)
+        signal.signal(signal.SIGHUP, _on_reload)
+
+        fan_logger = backend = None
+        try:
             if args.dry_run:
                 print('Running in dry-run mode')
 
             # Clean previous database if not prevented
             if not args.no_delete and DB_PATH.exists():
                 DB_PATH.unlink()
-
-            while True:
-                temperature = get_gpu_temperature()
+            fan_logger = FanDataLogger()
+            backend = create_backend(args.backend, control=not args.dry_run)
+            curve = load_curve(args.speed, args.max)
+            poller = AdaptivePoller(curve.temps, args.min_interval, args.cooldown)
+            logging.info(f"Using {backend.name} backend")
+
+            while not stop.is_set():
+                if reload.is_set():
+                    reload.clear()
+                    curve = load_curve(args.speed, args.max)
+                    poller.breakpoints = curve.temps
+                    logging.info("Fan curve reloaded")
+
+                temperature = backend.get_temperature()
                 if temperature is None:
                     logging.error("Could not retrieve GPU temperature")
                     break
 
-                fan_speed = calculate_fan_speed(temperature)
-                # log_fan_data(temperature, fan_speed)
-                print(temperature, fan_speed, sep='|')
+                fan_speed = curve(temperature)
+                fan_logger.log(temperature, fan_speed)
 
-                # if not args.dry_run:
-                #     if fan_speed == -1:
-                #         set_fan_speed_auto()
-                #     else:
-                #         set_fan_speed(fan_speed)
+                if not args.dry_run:
+                    backend.set_speed(fan_speed)
 
                 print(temperature, fan_speed, sep=' | ')
-                time.sleep(args.cooldown)
+                wake.wait(poller.next_interval(temperature))
+                wake.clear()
 
         except Exception as e:
             logging.critical(f"Unhandled exception: {e}")
         finally:
+            if backend:
+                if not args.dry_run:
+                    backend.set_speed(-1)
+                backend.close()
+            if fan_logger:
+                fan_logger.close()
             fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
@@ -4,10 +4,11 @@ import os, sys, shutil, click  # noqa
 from pathlib import Path
 from rich import print
 
-from utils.utils import command_config, path_config, clean_filename
+from utils.utils import command_config, path_config, plan_clean_filenames
+from utils.journal import Move, MovePlan, Journal, journal_path, run_journaled
+from utils.scan import scan
 
-__version__ = "0.3.0"
-errors = {}
+__version__ = "0.4.0"
 
 
 def chunk_it(data: list, n: int):
@@ -16,6 +17,10 @@ def chunk_it(data: list, n: int):
         yield data[i:i + n]
 
 
+def list_files(folder_path: Path) -> list[str]:
+    return [i.name for i in scan(folder_path, recursive=False, regular=True)]
+
+
 @click.command(**command_config)
 @click.version_option(__version__, prog_name='chunkfiles')
 @click.argument('input_path', type=path_config)
@@ -26,7 +31,12 @@ def chunk_it(data: list, n: int):
 @click.option('--prefix', help='Prefix of each folder chunked folder', default='chunk-', show_default=True)
 @click.option('--suffix', help='Suffix of each folder chunked folder', default='x', show_default=True)
 @click.option('--output', '-o', type=path_config, help='Output path to create subfolders in')
-def main(input_path: Path, count: int, prefix: str, suffix: str, output: Path, start: int):
+@click.option('--dry-run', is_flag=True, help='Show the planned moves without changing anything')
+@click.option('--resume', is_flag=True, help='Continue an interrupted run from its journal')
+@click.option('--undo', is_flag=True, help='Move files from the last run back out of their chunk folders')
+@click.option('--journal', type=click.Path(dir_okay=False, path_type=Path), help='Journal file to use')
+def main(input_path: Path, count: int, prefix: str, suffix: str, output: Path, start: int, dry_run: bool,
+         resume: bool, undo: bool, journal: Path | None):
     """
     Group all first-level files into subfolders. All subfolders will be serialized and can be customized with any
     prefix and suffix of your choice. \n
@@ -35,43 +45,51 @@ def main(input_path: Path, count: int, prefix: str, suffix: str, output: Path, s
     folder_path = input_path
     output = output or folder_path
 
-    # Rename
-    files = [i for i in os.listdir(folder_path) if os.path.isfile(i)]
-    if not files:
-        raise click.ClickException('You did not provide an input path: Example: chunkfiles .')
-    for name in files:
-        try:
-            clean_filename(folder_path, name)
-        except Exception as e:
-            click.echo('Unable to rename file. Skipping.')
-
-    files = sorted([i for i in os.listdir(folder_path) if os.path.isfile(i)])
-    chunks = list(chunk_it(files, count))
-    pad = len(str(len(chunks)))
-    pad = 2 if pad == 1 else pad
-    counter = 0
-
-    for idx, namelist in enumerate(chunks):
-        num = start + idx
-        chunk_name = f'{prefix}{num:0{pad}}{suffix}'
-        folder = os.path.join(output, chunk_name)
-
-        os.makedirs(folder, exist_ok=True)
-        for name in namelist:
-            from_path = os.path.join(folder_path, name)
-            to_path = os.path.join(output, chunk_name, name)
-
-            try:
-                shutil.move(from_path, to_path)
-                counter += 1
-            except Exception:  # noqa
-                errors.setdefault('unmoved', [])
-                errors['unmoved'].append(name)
+    def _make_plan() -> MovePlan:
+        files = list_files(folder_path)
+        if not files:
+            raise click.ClickException('You did not provide an input path: Example: chunkfiles .')
+
+        # Clean names first as plain renames so they are journaled and undone like the chunk moves
+        renames, retained = plan_clean_filenames(files)
+        if retained:
+            click.echo(f'Unable to rename {len(retained)} file(s), retained. Skipping.')
+        moves: list[Move] = [Move(os.path.join(folder_path, old), os.path.join(folder_path, new), True)
+                             for old, new in renames.items()]
+        files = [renames.get(i, i) for i in files]
+
+        chunks = list(chunk_it(sorted(files), count))
+        pad = len(str(len(chunks)))
+        pad = 2 if pad == 1 else pad
+        same_dev = os.stat(folder_path).st_dev == os.stat(output).st_dev
+
+        created: list[str] = []
+        for idx, namelist in enumerate(chunks):
+            num = start + idx
+            chunk_name = f'{prefix}{num:0{pad}}{suffix}'
+            folder = os.path.join(output, chunk_name)
+            if not os.path.isdir(folder):
+                created.append(folder)
+
+            for name in namelist:
+                from_path = os.path.join(folder_path, name)
+                to_path = os.path.join(output, chunk_name, name)
+                moves.append(Move(from_path, to_path, same_dev))
+        return MovePlan(moves, {'created': created})
+
+    paths = [folder_path, output]
+    plan, counter, errors = run_journaled(Journal(journal or journal_path('chunkfiles', *paths)), _make_plan,
+                                          dry_run=dry_run, resume=resume, undo=undo, paths=paths)
 
     if len(errors):
         print(errors)
 
-    total = f'{counter} files moved'
+    indexes = plan.reversible if undo else plan.pending
+    renamed = sum(os.path.dirname(plan.moves[i].dst) == str(folder_path) for i in indexes)
+    action = 'would be moved' if dry_run else 'restored' if undo else 'moved'
+    total = f'{len(indexes) - renamed if dry_run else counter - renamed} files {action}'
+    if renamed:
+        total += f', {renamed} renamed'
     print(total)
 
 
@@ -2,15 +2,19 @@
 
 import os, sys, shutil, click  # noqa
 from pathlib import Path
+from typing import Container
 from rich import print
 from icecream import IceCreamDebugger
 
 from utils.utils import command_config, path_config
+from utils.fileops import is_same_content
+from utils.journal import Move, MovePlan, Journal, journal_path, run_journaled
+from utils.scan import walk
 
 
-__version__ = '0.3.0'
+__version__ = '0.5.0'
 ic = IceCreamDebugger(prefix='')
-errors = {}
+COLLISION_POLICIES = ['rename', 'skip', 'hash']
 
 
 def is_valid_folder(prefix: str, name: str) -> bool:
@@ -21,52 +25,112 @@ def cleanup_folders(path: str):
     os.rmdir(path)
 
 
+def scan_chunks(input_paths: tuple[Path], prefix: str, workers: int = 1) -> tuple[list[str], list[tuple[str, str]]]:
+    """
+    Single scandir pass over every input path and its prefixed subfolders.
+    Returns the chunk folders found and every (path, name) entry inside them.
+    """
+    folders: list[str] = []
+    for _, dirs, _ in walk(input_paths, recursive=False, skip_dirs=frozenset()):
+        folders.extend(sorted(i.path for i in dirs if is_valid_folder(prefix, i.name)))
+
+    entries: list[tuple[str, str]] = []
+    for _, dirs, files in walk(folders, recursive=False, skip_dirs=frozenset(), workers=workers):
+        entries.extend(sorted((i.path, i.name) for i in (*dirs, *files)))
+    return folders, entries
+
+
+def unique_name(name: str, taken: Container[str]) -> str:
+    stem, ext = os.path.splitext(name)
+    num = 1
+    while (new_name := f'{stem}-{num}{ext}') in taken:
+        num += 1
+    return new_name
+
+
+def plan_moves(entries: list[tuple[str, str]], output: Path, policy: str) -> tuple[list[Move], dict[str, list]]:
+    """
+    Resolve every destination name in memory before anything is touched.
+    Collisions are checked against the output folder and against the other chunk folders.
+    """
+    with os.scandir(output) as it:
+        claimed: dict[str, str] = {i.name: i.path for i in it}
+
+    output_dev = os.stat(output).st_dev
+    devices: dict[str, bool] = {}
+    digests: dict[str, bytes] = {}
+    moves: list[Move] = []
+    report: dict[str, list] = {}
+
+    for src, name in entries:
+        if name in claimed:
+            if policy == 'skip':
+                report.setdefault('skipped', []).append(src)
+                continue
+            if policy == 'hash' and is_same_content(src, claimed[name], digests):
+                report.setdefault('duplicates', []).append(src)
+                continue
+            report.setdefault('renamed', []).append(src)
+            name = unique_name(name, claimed)
+
+        parent = os.path.dirname(src)
+        if parent not in devices:
+            devices[parent] = os.stat(parent).st_dev == output_dev
+
+        claimed[name] = src
+        moves.append(Move(src, os.path.join(output, name), devices[parent]))
+    return moves, report
+
+
 @click.command(**command_config)
 @click.version_option(__version__, prog_name='mergefiles')
 @click.argument('input_paths', type=path_config, nargs=-1)
 @click.option('--prefix', '-p', help='Prefix of each folder chunked folder', default='chunk-', show_default=True)
 @click.option('--output', '-o', type=path_config, help='Output path to create subfolders in', default='.',
               show_default=True)
-def main(input_paths: tuple[Path], prefix: str, output: Path):
+@click.option('--collision', '-C', type=click.Choice(COLLISION_POLICIES), default='rename', show_default=True,
+              help='What to do when a file name already exists. "hash" skips identical files and renames the rest')
+@click.option('--workers', '-w', type=click.IntRange(min=1, max=64), default=8, show_default=True,
+              help='Number of files moved at the same time')
+@click.option('--dry-run', is_flag=True, help='Show the planned moves without changing anything')
+@click.option('--resume', is_flag=True, help='Continue an interrupted run from its journal')
+@click.option('--undo', is_flag=True, help='Move files from the last run back to their chunk folders')
+@click.option('--journal', type=click.Path(dir_okay=False, path_type=Path), help='Journal file to use')
+def main(input_paths: tuple[Path], prefix: str, output: Path, collision: str, workers: int, dry_run: bool,
+         resume: bool, undo: bool, journal: Path | None):
     """
     Collate all files in subfolders that have a specific prefix. Only searches for first-level subfolders.\n
     Works with the chunkfiles script.
     """
     output_path = output
-    counter = 0
-
-    chunk_folders: list[str] = []
-    for path in input_paths:
-        chunk_folders.extend([i for i in os.listdir(path) if is_valid_folder(prefix, i)])
-
-    for folder_path in input_paths:
-        for folder in chunk_folders:
-            subfolder_path = os.path.join(folder_path, folder)
-
-            if not os.path.isdir(subfolder_path):
-                continue
+    report: dict[str, list] = {}
 
-            counter += len(os.listdir(subfolder_path))
-            for file in os.listdir(subfolder_path):
-                from_path = os.path.join(folder_path, folder, file)
-                to_path = os.path.join(output_path, file)
+    def _make_plan() -> MovePlan:
+        folders, entries = scan_chunks(input_paths, prefix, workers)
+        moves, skipped = plan_moves(entries, output_path, collision)
+        report.update(skipped)
+        return MovePlan(moves, {'folders': folders})
 
-                try:
-                    shutil.move(from_path, to_path)
-                except Exception:   # noqa
-                    errors.setdefault('unmoved', [])
-                    errors['unmoved'].append(from_path)
+    paths = [*sorted(input_paths), output_path]
+    plan, counter, errors = run_journaled(Journal(journal or journal_path('mergefiles', *paths)), _make_plan,
+                                          dry_run=dry_run, resume=resume, undo=undo, workers=workers, paths=paths)
 
+    if not (dry_run or undo):
+        for folder in plan.meta.get('folders', []):
             try:
-                cleanup_folders(subfolder_path)
+                cleanup_folders(folder)
             except Exception:   # noqa
                 errors.setdefault('undeleted', [])
-                errors['undeleted'].append(subfolder_path)
+                errors['undeleted'].append(folder)
 
+    if len(report):
+        print(report)
     if len(errors):
         print(errors)
 
-    total = f'{counter} files moved'
+    action = 'would be moved' if dry_run else 'restored' if undo else 'moved'
+    planned = len(plan.reversible if undo else plan.pending)
+    total = f'{planned if dry_run else counter} files {action}'
     print(total)
 
 
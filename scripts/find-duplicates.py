@@ -9,6 +9,8 @@ import humanize
 from tabulate import tabulate
 from typing import Dict, List, Tuple, Union
 
+from utils.scan import Entry, scan
+
 def truncate_path(path: str, max_length: int = 60) -> str:
     """Truncate the path to the specified maximum length."""
     if len(path) <= max_length:
@@ -37,16 +39,12 @@ def find_duplicates(folder: str, with_size: bool, sensitive: bool, non_recursive
         click.echo("Error: Specified path is not a directory.")
         return
 
-    files: Dict[Union[str, Tuple[str, int]], List[Path]] = defaultdict(list)
-    for root, _, filenames in os.walk(folder_path):
-        if non_recursive and root != str(folder_path):
-            continue
-        for filename in filenames:
-            file_path = Path(root) / filename
-            key = (file_path.name, file_path.stat().st_size) if with_size else file_path.name
-            if not sensitive:
-                key = str(key).lower()
-            files[key].append(file_path)
+    files: Dict[Union[str, Tuple[str, int]], List[Entry]] = defaultdict(list)
+    for entry in scan(folder_path, recursive=not non_recursive, with_stat=with_size):
+        key = (entry.name, entry.stat.st_size) if with_size else entry.name
+        if not sensitive:
+            key = str(key).lower()
+        files[key].append(entry)
 
     duplicates = {k: v for k, v in files.items() if len(v) > 1}
     if not duplicates:
@@ -58,7 +56,7 @@ def find_duplicates(folder: str, with_size: bool, sensitive: bool, non_recursive
     else:
         show_duplicates_individually(duplicates, folder_path, no_truncate, with_time, with_modified)
 
-def show_all_duplicates(duplicates: Dict[Union[str, Tuple[str, int]], List[Path]], folder_path: Path, 
+def show_all_duplicates(duplicates: Dict[Union[str, Tuple[str, int]], List[Entry]], folder_path: Path, 
                         no_truncate: bool, with_time: bool, with_modified: bool) -> None:
     """Display all duplicate sets in a single table."""
     all_duplicates = []
@@ -74,9 +72,9 @@ def show_all_duplicates(duplicates: Dict[Union[str, Tuple[str, int]], List[Path]
     if with_modified:
         headers.append("Modified")
     click.echo(tabulate(all_duplicates, headers=headers, tablefmt="pipe"))
-    handle_deletion(duplicates, folder_path)
+    handle_deletion(list(duplicates.values()), folder_path)
 
-def show_duplicates_individually(duplicates: Dict[Union[str, Tuple[str, int]], List[Path]], folder_path: Path, 
+def show_duplicates_individually(duplicates: Dict[Union[str, Tuple[str, int]], List[Entry]], folder_path: Path, 
                                  no_truncate: bool, with_time: bool, with_modified: bool) -> None:
     """Display duplicate sets one at a time."""
     for _, paths in duplicates.items():
@@ -96,12 +94,13 @@ def show_duplicates_individually(duplicates: Dict[Union[str, Tuple[str, int]], L
         elif action == "next":
             continue
 
-def create_file_row(path: Path, folder_path: Path, index: int, no_truncate: bool, with_time: bool, with_modified: bool) -> List[Union[int, str]]:
+def create_file_row(entry: Entry, folder_path: Path, index: int, no_truncate: bool, with_time: bool, with_modified: bool) -> List[Union[int, str]]:
     """Create a row of file information for the table."""
-    size = humanize.naturalsize(path.stat().st_size)
-    ctime = path.stat().st_ctime
-    mtime = path.stat().st_mtime
-    rel_path = path.relative_to(folder_path)
+    stat = entry.stat or os.stat(entry.path)
+    size = humanize.naturalsize(stat.st_size)
+    ctime = stat.st_ctime
+    mtime = stat.st_mtime
+    rel_path = Path(entry.path).relative_to(folder_path)
     
     if not no_truncate:
         rel_path = truncate_path(str(rel_path))
@@ -117,7 +116,7 @@ def create_file_row(path: Path, folder_path: Path, index: int, no_truncate: bool
     
     return row
 
-def handle_deletion(duplicate_sets: List[List[Path]], folder_path: Path) -> str:
+def handle_deletion(duplicate_sets: List[List[Entry]], folder_path: Path) -> str:
     """Handle the deletion of files based on user input."""
     to_delete = click.prompt("Enter indices to delete (comma-separated), press Enter to skip, or type 'exit' to quit", type=str, default="")
     if to_delete.lower() == 'exit':
@@ -128,7 +127,7 @@ def handle_deletion(duplicate_sets: List[List[Path]], folder_path: Path) -> str:
     indices = [int(i.strip()) for i in to_delete.replace(' ', '').split(',') if i.strip().isdigit()]
     for idx in indices:
         if 1 <= idx <= sum(len(paths) for paths in duplicate_sets):
-            file_to_delete = [path for paths in duplicate_sets for path in paths][idx - 1]
+            file_to_delete = Path([entry.path for entries in duplicate_sets for entry in entries][idx - 1])
             try:
                 file_to_delete.unlink()
                 click.echo(f"Deleted: {file_to_delete.relative_to(folder_path)}")
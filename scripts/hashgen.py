@@ -1,28 +1,78 @@
 #!/usr/bin/env python3
 
-import random
+import os
+import sys
 import click
+from typing import Iterator
 
 
 DEFAULT_CHARS = "ABCDEFGHJKLMNPQRSTVWXYZabcdefghjkmnpqrstvwxyz23456789"
 ALL_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+BATCH_SIZE = 1 << 16     # Hashes per write
+
+
+def make_table(alphabet: bytes) -> tuple[bytes, bytes]:
+    """
+    Translation table mapping each random byte to a character. Bytes at or above the largest multiple of the
+    alphabet size are rejected so every character is equally likely.
+    """
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(alphabet[i % len(alphabet)] if i < limit else 0 for i in range(256))
+    return table, bytes(range(limit, 256))
+
+
+def random_chars(size: int, table: bytes, rejected: bytes) -> bytes:
+    """Draw at least `size` uniformly distributed characters from os.urandom in bulk."""
+    ratio = 256 / (256 - len(rejected))
+    chunks, total = [], 0
+    while total < size:
+        chunk = os.urandom(int((size - total) * ratio * 1.05) + 64).translate(table, rejected)
+        chunks.append(chunk)
+        total += len(chunk)
+    return b''.join(chunks)
+
+
+def generate(alphabet: bytes, length: int, count: int, unique: bool = False) -> Iterator[list[bytes]]:
+    """Yield batches of hashes. With unique, repeats are dropped and replaced until count is reached."""
+    table, rejected = make_table(alphabet)
+    seen: set[bytes] = set()
+    remaining = count
+
+    while remaining:
+        size = min(remaining, BATCH_SIZE)
+        data = random_chars(size * length, table, rejected)
+        batch = [data[i:i + length] for i in range(0, size * length, length)]
+        if unique:
+            batch = [i for i in dict.fromkeys(batch) if i not in seen]
+            seen.update(batch)
+        remaining -= len(batch)
+        yield batch
 
 
 @click.command()
-@click.argument("length", default=4, type=int)
+@click.argument("length", default=4, type=click.IntRange(min=1))
 @click.option('-f', "--full", is_flag=True, show_default=True, type=bool, help="Include lowercase characters.")
 @click.option("-a", "--all", "all_", is_flag=True, help="Include all alphanumeric characters.")
-@click.option("-c", "--count", default=1, show_default=True, type=int, help="Number of hashes to generate.")
-def generate_hash(length: int, full: bool, all_: bool, count: int):
+@click.option("-c", "--count", default=1, show_default=True, type=click.IntRange(min=0),
+              help="Number of hashes to generate.")
+@click.option("-u", "--unique", is_flag=True, help="Never output the same hash twice.")
+def generate_hash(length: int, full: bool, all_: bool, count: int, unique: bool):
     """
     Generate random alphanumeric hashes. Excludes similar looking characters such as 1, l, I, i.
     Use -a to include all alphanumeric characters.
     """
     chars = ALL_CHARS if all_ else DEFAULT_CHARS
-    for _ in range(count):
-        hash_ = "".join(random.choices(chars, k=length))
-        hash_ = full and hash_ or hash_.upper()
-        print(hash_)
+    chars = chars if full else chars.upper()
+    alphabet = ''.join(dict.fromkeys(chars)).encode()
+
+    if unique and count > len(alphabet) ** length:
+        raise click.BadParameter(f'Only {len(alphabet) ** length} unique hashes of length {length} exist.',
+                                 param_hint='--count')
+
+    out = sys.stdout.buffer
+    for batch in generate(alphabet, length, count, unique):
+        out.write(b'\n'.join(batch) + b'\n' if batch else b'')
+    out.flush()
 
 
 if __name__ == "__main__":
@@ -2,11 +2,17 @@
 
 import os
 import sys
+import glob
+import math
+import time
+import bisect
+import struct
 import fcntl
 import re
 import logging
 import subprocess
 import configparser
+from array import array
 from logging.handlers import RotatingFileHandler
 from setproctitle import setproctitle
 
@@ -14,12 +20,20 @@ import PyQt5.QtWidgets as QtWidgets
 import PyQt5.QtCore as QtCore
 import PyQt5.QtGui as QtGui
 
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
 
 # Global Defaults
 DEFAULT_CONFIG = {
     'General': {
         'poll_interval': '3',
-        'log_file': '/var/log/oversensors.log'
+        'log_file': '/var/log/oversensors.log',
+        'history_size': '60',
+        'history_flush': '300',
+        'history_file': '~/.local/share/oversensors/history.bin'
     },
     'Thresholds': {
         'cpu_normal': '65',
@@ -42,30 +56,136 @@ DEFAULT_CONFIG = {
     },
     'Display': {
         'overlay_position': 'top-right',
+        'sparkline': 'yes',
+        'sparkline_width': '20'
     }
 }
+THRESHOLD_KEYS = {'cpu': 'cpu', 'gpu': 'gpu', 'nvme': 'nvme', 'fans': 'fan'}
+BAND_COLORS = [
+    'rgba(29,101,0,0.7)',       # Green
+    'rgba(29,101,0,0.7)',       # Green
+    'rgba(255,132,0,0.5)',      # Orange
+    'rgba(117,0,0,0.8)',        # Red
+    'rgba(100,100,100,50)',     # Neutral gray
+]
+NEUTRAL_BAND = len(BAND_COLORS) - 1
 
 
 class TemperatureConfig:
     def __init__(self):
         self.config_path = os.path.expanduser('~/.config/oversensors.ini')
-        self.config = configparser.ConfigParser()
         self.load_config()
 
 
     def load_config(self):
+        self.config = configparser.ConfigParser()
         self.config.read_dict(DEFAULT_CONFIG)
+        self.mtime: float | None = None
         if os.path.exists(self.config_path):
+            self.mtime = os.path.getmtime(self.config_path)
             self.config.read(self.config_path)
+        self.thresholds: dict[str, tuple[int, int, int]] = self._load_thresholds()
+
+
+    def _load_thresholds(self) -> dict[str, tuple[int, int, int]]:
+        """Parse and validate every threshold once so the overlay never touches the ConfigParser per tick."""
+        thresholds = {}
+        for component, prefix in THRESHOLD_KEYS.items():
+            keys = [f'{prefix}_{i}' for i in ('normal', 'warm', 'hot')]
+            try:
+                values = tuple(int(self.config.get('Thresholds', i)) for i in keys)
+                if list(values) != sorted(values):
+                    raise ValueError(f'{", ".join(keys)} must be in ascending order')
+            except ValueError as e:
+                logging.error(f"Invalid thresholds for {component}, using defaults: {e}")
+                values = tuple(int(DEFAULT_CONFIG['Thresholds'][i]) for i in keys)
+            thresholds[component] = values
+        return thresholds
 
 
     def get(self, section, key, fallback=None):
         return self.config.get(section, key, fallback=fallback)
 
 
+class HwmonSensors:
+    """
+    Temperature inputs found once under /sys/class/hwmon. The files stay open and each poll is a pread per
+    sensor instead of forking `sensors`.
+    """
+    LABELS = {'cpu': 'Tctl', 'gpu': 'edge', 'nvme': 'Composite'}
+
+    def __init__(self, root: str = '/sys/class/hwmon'):
+        self.fds: dict[str, int] = {}
+        self._discover(root)
+
+
+    def _discover(self, root: str):
+        labels = {v: k for k, v in self.LABELS.items()}
+        for label_path in sorted(glob.glob(os.path.join(root, 'hwmon*', 'temp*_label'))):
+            try:
+                with open(label_path) as f:
+                    key = labels.get(f.read().strip())
+                if key is None or key in self.fds:
+                    continue
+                self.fds[key] = os.open(label_path.replace('_label', '_input'), os.O_RDONLY)
+            except OSError as e:
+                logging.error(f"hwmon discovery error for {label_path}: {e}")
+
+
+    def read(self) -> dict[str, float]:
+        data = {}
+        for key, fd in self.fds.items():
+            try:
+                data[key] = round(int(os.pread(fd, 16, 0)) / 1000, 1)
+            except (OSError, ValueError) as e:
+                logging.error(f"hwmon read error for {key}: {e}")
+        return data
+
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds.clear()
+
+
+class NvmlFan:
+    """GPU fan speed through one NVML handle kept for the whole run, so a poll is a library call and not a fork."""
+
+    def __init__(self, index: int = 0):
+        self.handle = None
+        if pynvml is None:
+            return
+        try:
+            pynvml.nvmlInit()
+            self.handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+        except pynvml.NVMLError as e:
+            logging.error(f"NVML unavailable, falling back to nvidia-smi: {e}")
+
+
+    def read(self) -> int | None:
+        """Fan speed in percent, -1 on a failed read and None when NVML is not available at all."""
+        if self.handle is None:
+            return None
+        try:
+            return pynvml.nvmlDeviceGetFanSpeed(self.handle)
+        except pynvml.NVMLError as e:
+            logging.error(f"NVML fan read error: {e}")
+            return -1
+
+
+    def close(self):
+        if self.handle is not None:
+            pynvml.nvmlShutdown()
+            self.handle = None
+
+
 class TemperatureMonitor:
     def __init__(self, config: TemperatureConfig):
         self.config = config
+        self.hwmon = HwmonSensors()
+        # Decided once at discovery: only what hwmon could not find is ever read from `sensors`
+        self.fallback = [i for i in HwmonSensors.LABELS if i not in self.hwmon.fds]
+        self.fan = NvmlFan()
         # self.setup_logging()
 
 
@@ -80,8 +200,17 @@ class TemperatureMonitor:
     #         handlers=[handler]
     #     )
 
+    def get_temperatures(self) -> dict[str, float]:
+        data = dict.fromkeys(HwmonSensors.LABELS, -1)
+        if self.fallback:
+            fallback = self.get_sensors_temperatures()
+            data.update({i: fallback[i] for i in self.fallback})
+        data.update(self.hwmon.read())
+        return data
+
+
     @staticmethod
-    def get_temperatures() -> dict[str, float]:
+    def get_sensors_temperatures() -> dict[str, float]:
         try:
             system_temps = subprocess.check_output(['sensors'], text=True)
 
@@ -100,8 +229,10 @@ class TemperatureMonitor:
             return {'cpu': -1, 'gpu': -1, 'nvme': -1}
 
 
-    @staticmethod
-    def get_gpu_fans() -> int:
+    def get_gpu_fans(self) -> int:
+        if (speed := self.fan.read()) is not None:
+            return speed
+
         try:
             nvidia_output = subprocess.check_output(['nvidia-smi', '--query-gpu=fan.speed', '--format=csv,noheader'],
                                                     text=True)
@@ -111,14 +242,118 @@ class TemperatureMonitor:
             return -1
 
 
+    def close(self):
+        self.hwmon.close()
+        self.fan.close()
+
+
+class SensorWorker(QtCore.QObject):
+    """Polls the sensors on its own thread so blocking reads never stall the overlay."""
+    readings = QtCore.pyqtSignal(dict, int)
+
+    def __init__(self, monitor: TemperatureMonitor, interval: int):
+        super().__init__()
+        self.monitor = monitor
+        self.interval = interval
+        self.timer = None
+
+
+    @QtCore.pyqtSlot()
+    def start(self):
+        # Created here so the timer lives on the worker thread
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.sample)
+        self.timer.start(self.interval)
+        self.sample()
+
+
+    @QtCore.pyqtSlot()
+    def stop(self):
+        # Timers can only be stopped from the thread they live on
+        if self.timer is not None:
+            self.timer.stop()
+
+
+    @QtCore.pyqtSlot()
+    def sample(self):
+        self.readings.emit(self.monitor.get_temperatures(), self.monitor.get_gpu_fans())
+
+
+class SampleHistory:
+    """
+    Fixed-size ring buffer of recent readings per sensor. Every sample is also queued as a packed record and the
+    queue is appended to `path` in one write per flush. Records are little-endian
+    <uint32 unix time, float32 cpu, float32 gpu, float32 nvme, float32 fans>, missing readings are NaN.
+    """
+    KEYS = ('cpu', 'gpu', 'nvme', 'fans')
+    RECORD = struct.Struct('<I4f')
+    SPARKS = '▁▂▃▄▅▆▇█'
+
+    def __init__(self, size: int, path: str):
+        self.size = max(size, 1)
+        self.path = os.path.expanduser(path)
+        self.buffers = {key: array('f', [math.nan]) * self.size for key in self.KEYS}
+        self.index = 0
+        self.count = 0
+        self.pending = bytearray()
+
+
+    def append(self, readings: dict[str, float], timestamp: float | None = None):
+        values = [readings.get(key, -1) for key in self.KEYS]
+        values = [math.nan if i < 0 else i for i in values]
+        for key, value in zip(self.KEYS, values):
+            self.buffers[key][self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.pending += self.RECORD.pack(int(timestamp or time.time()), *values)
+
+
+    def values(self, key: str) -> list[float]:
+        """Oldest first"""
+        buf = self.buffers[key]
+        if self.count < self.size:
+            return buf[:self.count].tolist()
+        return (buf[self.index:] + buf[:self.index]).tolist()
+
+
+    def sparkline(self, key: str, width: int) -> str:
+        values = self.values(key)[-width:]
+        valid = [i for i in values if not math.isnan(i)]
+        if not valid:
+            return ''
+        low, span = min(valid), (max(valid) - min(valid)) or 1
+        top = len(self.SPARKS) - 1
+        return ''.join(' ' if math.isnan(i) else self.SPARKS[round((i - low) / span * top)] for i in values)
+
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'ab') as f:
+                f.write(self.pending)
+            self.pending.clear()
+        except OSError as e:
+            logging.error(f"History flush error: {e}")
+
+
 class TemperatureOverlay(QtWidgets.QWidget):
     def __init__(self, config: TemperatureConfig):
         super().__init__()
         self.config = config
         self.monitor = TemperatureMonitor(config)
+        self._texts: dict[str, str] = {}
+        self._bands: dict[str, int] = {}
+        self._stylesheets = [self._get_stylesheet(i) for i in BAND_COLORS]
+        self._last: tuple[dict[str, float], int] | None = None
+        self.history = SampleHistory(int(config.get('General', 'history_size')),
+                                     config.get('General', 'history_file'))
 
         self._setup_ui()
-        self._setup_timer()
+        self._setup_worker()
+        self._setup_watcher()
+        self._setup_history()
 
 
     def _setup_ui(self):
@@ -148,6 +383,15 @@ class TemperatureOverlay(QtWidgets.QWidget):
             label.setFont(QtGui.QFont('Consolas', 10))
             layout.addWidget(label)
 
+        self.sparks = {}
+        if self.config.get('Display', 'sparkline') == 'yes':
+            for key, label in self.labels.items():
+                spark = QtWidgets.QLabel('')
+                spark.setStyleSheet('color: white; background-color: rgba(0, 0, 0, 60); padding: 0 3px;')
+                spark.setFont(QtGui.QFont('Consolas', 6))
+                layout.insertWidget(layout.indexOf(label) + 1, spark)
+                self.sparks[key] = spark
+
         # top-left
         xpos = 35
         ypos = 50
@@ -163,28 +407,89 @@ class TemperatureOverlay(QtWidgets.QWidget):
         self.setGeometry(xpos, ypos, 60, 100)
 
 
-    def _setup_timer(self):
+    def _setup_worker(self):
         interval = int(self.config.get('General', 'poll_interval')) * 1000
-        self.timer = QtCore.QTimer(self)
-        self.timer.timeout.connect(self.update_temperatures)
-        self.timer.start(interval)
+        self._sampler_thread = QtCore.QThread(self)
+        self.worker = SensorWorker(self.monitor, interval)
+        self.worker.moveToThread(self._sampler_thread)
+        self._sampler_thread.started.connect(self.worker.start)
+        self.worker.readings.connect(self.update_temperatures)
+        self._sampler_thread.finished.connect(self.worker.deleteLater)
+        self._sampler_thread.start()
+
+
+    def _setup_watcher(self):
+        # Qt uses inotify on Linux. The folder is watched too since editors often replace the file on save.
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.addPath(os.path.dirname(self.config.config_path))
+        if os.path.exists(self.config.config_path):
+            self.watcher.addPath(self.config.config_path)
+        self.watcher.fileChanged.connect(self._reload_config)
+        self.watcher.directoryChanged.connect(self._reload_config)
+
 
+    def _reload_config(self, *args):
+        mtime = os.path.getmtime(self.config.config_path) if os.path.exists(self.config.config_path) else None
+        if mtime == self.config.mtime:
+            return
 
-    def update_temperatures(self):
-        temps = self.monitor.get_temperatures()
-        fans = self.monitor.get_gpu_fans()
+        self.config.load_config()
+        if self.config.config_path not in self.watcher.files() and os.path.exists(self.config.config_path):
+            self.watcher.addPath(self.config.config_path)
 
+        self._bands.clear()
+        if self._last:
+            self._render(*self._last)
+
+
+    def _setup_history(self):
+        interval = int(self.config.get('General', 'history_flush')) * 1000
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.timeout.connect(self.history.flush)
+        self.flush_timer.start(interval)
+
+
+    def stop_worker(self):
+        QtCore.QMetaObject.invokeMethod(self.worker, 'stop', QtCore.Qt.BlockingQueuedConnection)
+        self._sampler_thread.quit()
+        self._sampler_thread.wait()
+        self.monitor.close()
+        self.history.flush()
+
+
+    def _set_label(self, key: str, text: str, band: int):
+        """Only touch the widget when something visible changed, each setter triggers a repaint."""
+        if self._texts.get(key) != text:
+            self._texts[key] = text
+            self.labels[key].setText(text)
+        if self._bands.get(key) != band:
+            self._bands[key] = band
+            self.labels[key].setStyleSheet(self._stylesheets[band])
+
+
+    @QtCore.pyqtSlot(dict, int)
+    def update_temperatures(self, temps: dict[str, float], fans: int):
+        self._last = temps, fans
+        self.history.append({**temps, 'fans': fans})
+        self._render(temps, fans)
+
+
+    def _render(self, temps: dict[str, float], fans: int):
         cpu_data = temps['cpu']
         gpu_data = temps['gpu']
         nvme_data = temps['nvme']
         fans_data = fans
 
-        self.labels['cpu'].setText(f"CPU: {cpu_data}°C")
-        self.labels['gpu'].setText(f"GPU: {gpu_data}°C/{fans_data}%")
-        self.labels['nvme'].setText(f"M.2: {nvme_data}°C")
-        self.labels['cpu'].setStyleSheet(self._get_stylesheet(self._get_temp_color('cpu', cpu_data, fans_data)))
-        self.labels['gpu'].setStyleSheet(self._get_stylesheet(self._get_temp_color('gpu', gpu_data)))
-        self.labels['nvme'].setStyleSheet(self._get_stylesheet(self._get_temp_color('nvme', nvme_data)))
+        self._set_label('cpu', f"CPU: {cpu_data}°C", self._get_temp_band('cpu', cpu_data, fans_data))
+        self._set_label('gpu', f"GPU: {gpu_data}°C/{fans_data}%", self._get_temp_band('gpu', gpu_data))
+        self._set_label('nvme', f"M.2: {nvme_data}°C", self._get_temp_band('nvme', nvme_data))
+
+        width = int(self.config.get('Display', 'sparkline_width'))
+        for key, spark in self.sparks.items():
+            text = self.history.sparkline(key, width)
+            if self._texts.get(f'{key}_spark') != text:
+                self._texts[f'{key}_spark'] = text
+                spark.setText(text)
 
         # for key, temp in temps.items():
         #     bgcolor = self._get_temp_color(key, temp)
@@ -211,42 +516,16 @@ class TemperatureOverlay(QtWidgets.QWidget):
             """
 
 
-    def _get_temp_color(self, component: str, temp: float, secondary: float | None = None) -> str:
-        # Implement color logic based on thresholds
-        thresholds = {
-            'cpu': (int(self.config.get('Thresholds', 'cpu_normal')), int(self.config.get('Thresholds', 'cpu_warm')),
-                    int(self.config.get('Thresholds', 'cpu_hot'))),
-            'gpu': (int(self.config.get('Thresholds', 'gpu_normal')), int(self.config.get('Thresholds', 'gpu_warm')),
-                    int(self.config.get('Thresholds', 'gpu_hot'))),
-            'nvme': (int(self.config.get('Thresholds', 'nvme_normal')), int(self.config.get('Thresholds', 'nvme_warm')),
-                     int(self.config.get('Thresholds', 'nvme_hot'))),
-            'fans': (int(self.config.get('Thresholds', 'fan_off')), int(self.config.get('Thresholds', 'fan_slow')),
-                     int(self.config.get('Thresholds', 'fan_fast')))
-        }
-
-        if component not in thresholds:
-            return 'rgba(100,100,100,50)'  # Neutral gray
-
-        normal, warm, hot = thresholds[component]
+    def _get_temp_band(self, component: str, temp: float, secondary: float | None = None) -> int:
+        """Index into BAND_COLORS. A secondary reading can only pull the band down, never up."""
+        thresholds = self.config.thresholds.get(component)
+        if thresholds is None:
+            return NEUTRAL_BAND
 
+        band = bisect.bisect_right(thresholds, temp)
         if secondary:
-            if temp < normal and secondary < normal:
-                return 'rgba(29,101,0,0.7)'  # Green
-            elif temp < warm or secondary < warm:
-                return 'rgba(29,101,0,0.7)'  # Green
-            elif temp < hot or secondary < hot:
-                return 'rgba(255,132,0,0.5)'  # Orange
-            else:
-                return 'rgba(117,0,0,0.8)'  # Red
-        else:
-            if temp < normal:
-                return 'rgba(29,101,0,0.7)'  # Green
-            elif temp < warm:
-                return 'rgba(29,101,0,0.7)'  # Green
-            elif temp < hot:
-                return 'rgba(255,132,0,0.5)'  # Orange
-            else:
-                return 'rgba(117,0,0,0.8)'  # Red
+            band = min(band, bisect.bisect_right(thresholds, secondary))
+        return band
 
 
     def _create_context_menu(self):
@@ -300,6 +579,7 @@ def main():
         app = QtWidgets.QApplication(sys.argv)
         config = TemperatureConfig()
         overlay = TemperatureOverlay(config)
+        app.aboutToQuit.connect(overlay.stop_worker)
         overlay.show()
         sys.exit(app.exec_())
     finally:
@@ -2,47 +2,84 @@
 
 import click
 import os
-from getpass import getpass
-from PyPDF2 import PdfReader, PdfWriter
+
+from utils.pdfstream import find_pdfs, check_file, decrypt_file, run_batch, read_password, write_report
 
 @click.command()
-@click.argument('input_path', type=click.Path(exists=True))
-@click.option('--output', '-o', type=click.Path(), help='Output file path')
-def remove_password(input_path, output):
-    """Remove password protection from a PDF file."""
-    # Get password securely
-    password = getpass("Enter PDF password: ")
-    
-    # Generate default output name if not provided
-    if not output:
-        filename = os.path.basename(input_path)
-        name, ext = os.path.splitext(filename)
-        output = f"{name}_unlocked{ext}"
-    
-    try:
-        # Read the PDF with password
-        reader = PdfReader(input_path)
-        if reader.is_encrypted:
-            reader.decrypt(password)
-        
-        # Create new PDF without encryption
-        writer = PdfWriter()
-        
-        # Add all pages to the writer
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Write the output file
-        with open(output, 'wb') as out_file:
-            writer.write(out_file)
-        
-        click.echo(f"Unlocked PDF saved to: {output}")
-    
-    except Exception as e:
-        click.echo(f"Error: {str(e)}", err=True)
-        return 1
-    
-    return 0
+@click.argument('input_paths', nargs=-1, required=True)
+@click.option('--output', '-o', type=click.Path(), help='Output file path, only for a single input')
+@click.option('--output-dir', '-d', type=click.Path(file_okay=False), default='.', show_default=True,
+              help='Folder for the unlocked copies')
+@click.option('--recursive', '-r', is_flag=True, help='Search folders and ** globs recursively')
+@click.option('--workers', '-w', type=click.IntRange(min=1, max=64), default=4, show_default=True,
+              help='Number of PDFs processed at the same time')
+@click.option('--password-fd', type=int, help='Read the password from this file descriptor instead of prompting')
+@click.option('--report', type=click.Path(dir_okay=False, writable=True), help='Write a CSV result per file')
+@click.option('--check', is_flag=True, help='Only classify files as encrypted, owner-only or open, write nothing')
+def remove_password(input_paths, output, output_dir, recursive, workers, password_fd, report, check):
+    """Remove password protection from PDF files. INPUT_PATHS can be files, folders or glob patterns."""
+    pdfs = find_pdfs(input_paths, recursive)
+    if not pdfs:
+        click.echo("Error: No PDF files found.", err=True)
+        raise SystemExit(1)
+
+    if output and len(pdfs) > 1:
+        raise click.UsageError("--output needs a single input file, use --output-dir for batches")
+
+    # Reads only each trailer and /Encrypt dictionary, so open files are never rewritten
+    checks = {i['path']: i for i in run_batch(check_file, [(i,) for i in pdfs], workers)}
+    failed = sum(i['status'] == 'failed' for i in checks.values())
+    if check:
+        for path in pdfs:
+            result = checks[path]
+            detail = result.get('error') or result['encryption']
+            click.echo(f"{result['status']:<11} {path}" + (f"  ({detail})" if detail else ''))
+        counts = {i: sum(r['status'] == i for r in checks.values()) for i in ('encrypted', 'owner-only', 'open')}
+        click.echo(', '.join(f"{total} {status}" for status, total in counts.items()) + f", {failed} failed")
+        if report:
+            write_report(report, [checks[i] for i in pdfs])
+        if failed:
+            raise SystemExit(1)
+        return
+
+    results = {}
+    for path, result in checks.items():
+        if result['status'] == 'open':
+            results[path] = {**result, 'status': 'skipped'}
+            click.echo(f"Not encrypted, skipped: {path}")
+        elif result['status'] == 'failed':
+            results[path] = result
+            click.echo(f"Error: {path}: {result['error']}", err=True)
+    todo = [i for i in pdfs if i not in results]
+
+    # Generate default output names if not provided
+    outputs = {}
+    for path in todo:
+        name, ext = os.path.splitext(os.path.basename(path))
+        outputs[path] = output or os.path.join(output_dir, f"{name}_unlocked{ext}")
+    clashes = len(outputs) - len(set(outputs.values()))
+    if clashes:
+        raise click.UsageError(f"{clashes} input(s) share a file name, their unlocked copies would overwrite "
+                               "each other")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Asked once for the whole batch, and only if some file can't be opened without one
+    password = None
+    if any(checks[i]['status'] == 'encrypted' for i in todo):
+        password = read_password("Enter PDF password: ", password_fd)
+
+    # Copies object by object without encryption, through a temp file renamed into place
+    for result in run_batch(decrypt_file, [(i, password, outputs[i]) for i in todo], workers):
+        results[result['path']] = {**checks[result['path']], 'error': '', **result}
+        if result['status'] == 'failed':
+            click.echo(f"Error: {result['path']}: {result['error']}", err=True)
+        else:
+            click.echo(f"Unlocked PDF saved to: {result['output']}")
+
+    if report:
+        write_report(report, [results[i] for i in pdfs])
+    if any(i['status'] == 'failed' for i in results.values()):
+        raise SystemExit(1)
 
 if __name__ == '__main__':
-    remove_password()
\ No newline at end of file
+    remove_password()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import os, shutil, tempfile, time, click     # noqa
+from PyPDF2 import PdfWriter, PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from utils.pdfstream import ALGORITHMS, rewrite_pdf
+
+
+def make_pdf(path: str, pages: int, image_kb: int):
+    """Pages sharing one font and one image, each with its own content stream, like a typical statement."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({       # noqa
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    image = DecodedStreamObject()
+    image.set_data(os.urandom(image_kb * 1024 // 3 * 3))
+    image.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Image'),
+        NameObject('/Width'): NumberObject(image_kb * 1024 // 3),
+        NameObject('/Height'): NumberObject(1),
+        NameObject('/ColorSpace'): NameObject('/DeviceRGB'),
+        NameObject('/BitsPerComponent'): NumberObject(8),
+    })
+    image = writer._add_object(image)       # noqa
+
+    for i in range(pages):
+        page = PageObject.create_blank_page(None, 612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f'BT /F1 12 Tf 72 720 Td (Page {i}) Tj ET q 100 0 0 10 72 600 cm /Im0 Do Q'.encode())
+        page[NameObject('/Contents')] = writer._add_object(content)     # noqa
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+            NameObject('/XObject'): DictionaryObject({NameObject('/Im0'): image}),
+        })
+        writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def best_of(repeat: int, func) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@click.command()
+@click.argument('pdf', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--pages', '-p', type=click.IntRange(min=1), default=200, show_default=True,
+              help='Pages in the generated PDF when none is given')
+@click.option('--image-kb', type=click.IntRange(min=1), default=64, show_default=True,
+              help='Size of the image shared by every generated page')
+@click.option('--repeat', '-r', type=click.IntRange(min=1), default=3, show_default=True,
+              help='Runs per measurement, the best one is shown')
+@click.option('--algorithm', '-a', 'algorithms', type=click.Choice(list(ALGORITHMS)), multiple=True,
+              help='Only benchmark these. Default: all')
+def main(pdf, pages, image_kb, repeat, algorithms):
+    """Encrypt and decrypt throughput of the PDF tools in pages per second, plus key derivation cost."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.pdf')
+        if pdf:
+            shutil.copyfile(pdf, source)
+        else:
+            make_pdf(source, pages, image_kb)
+        encrypted, decrypted = os.path.join(tmp, 'encrypted.pdf'), os.path.join(tmp, 'decrypted.pdf')
+        count = rewrite_pdf(source, decrypted)
+        click.echo(f'{count} pages, {os.path.getsize(source) / (1 << 20):.1f} MiB, best of {repeat}')
+
+        seconds = best_of(repeat, lambda: rewrite_pdf(source, decrypted))
+        click.echo(f"{'copy':<8} {'':>12} {count / seconds:>10.0f} pages/s")
+        for name in algorithms or ALGORITHMS:
+            derive = best_of(repeat, lambda: ALGORITHMS[name]('benchmark'))
+            encryption = ALGORITHMS[name]('benchmark')
+            encrypt = best_of(repeat, lambda: rewrite_pdf(source, encrypted, encryption=encryption.for_file()))
+            decrypt = best_of(repeat, lambda: rewrite_pdf(encrypted, decrypted, 'benchmark'))
+            click.echo(f'{name:<8} key {derive * 1000:>6.2f} ms {count / encrypt:>10.0f} pages/s encrypt '
+                       f'{count / decrypt:>10.0f} pages/s decrypt')
+
+
+if __name__ == '__main__':
+    main()
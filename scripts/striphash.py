@@ -1,73 +1,146 @@
 #!/usr/bin/env python3
 
 import os, re, click, sys  # noqa
+from pathlib import Path
 
-__version__ = '0.1.0'
+from utils.fileops import is_same_content
+from utils.journal import Move, MovePlan, Journal, journal_path, run_journaled
+from utils.scan import SKIP_DIRS, extensions, walk
+
+__version__ = '0.3.0'
 __progname__ = 'Stripslashes'
 
 
-def strip_hash(filename: str, formats: list[str], prefix: str):
+HASH_STYLES = {
+    'alnum': r'[a-zA-Z0-9]{9,16}',
+    'hex': r'[0-9a-fA-F]{8,64}',
+    'uuid': r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}',
+}
+
+
+def build_matcher(prefixes: list[str], styles: list[str]) -> re.Pattern:
+    """Compile every prefix and hash style into a single pattern, once per run."""
+    # Longest first so "--" wins over "-" when both are given
+    prefix_re = '|'.join(re.escape(i) for i in sorted(set(prefixes), key=len, reverse=True))
+    hash_re = '|'.join(HASH_STYLES[i] for i in dict.fromkeys(styles))
+    return re.compile(fr'^(.+?)\s*(?:{prefix_re})(?:{hash_re})$')
+
+
+def strip_hash(filename: str, formats: frozenset[str], matcher: re.Pattern):
     base, ext = os.path.splitext(filename)
     if ext[1:].lower() not in formats:
         return None
 
-    match = re.match(fr'^(.+?)\s*{prefix}[a-zA-Z0-9]{{9,16}}$', base)
+    match = matcher.match(base)
     if match:
         new_name = f"{match.group(1)}{ext}"
         return new_name
     return None
 
 
-def process_directory(directory: str, formats: list[str], recursive: bool, prefix: str, verbose: bool):
-    renamed_count = 0
-    processed_dirs = 0
-    retained_files = []
+def plan_renames(directory: str, formats: frozenset[str], recursive: bool, matcher: re.Pattern, dedupe: bool,
+                 workers: int = 1) -> tuple[list[Move], list[str]]:
+    """
+    First phase: walk the tree and resolve every rename in memory. A stripped name that is already taken, either on
+    disk or by an earlier rename in the same folder, is retained or, with dedupe, planned for deletion when its
+    content matches the file holding that name. Deletions come after every rename in the plan.
+    """
+    moves: list[Move] = []
+    retained_files: list[str] = []
+    duplicates: list[Move] = []
+    digests: dict[str, bytes] = {}
+
+    for root, dirs, files in walk(directory, recursive=recursive, workers=workers):
+        claimed: dict[str, str] = {i.name: i.path for i in (*dirs, *files)}
 
-    for root, dirs, files in os.walk(directory):
-        processed_dirs += 1
-        for filename in files:
-            full_path = os.path.join(root, filename)
-            new_name = strip_hash(filename, formats, prefix)
-            if new_name:
-                new_full_path = os.path.join(root, new_name)
-                if not os.path.exists(new_full_path):
-                    os.rename(full_path, new_full_path)
-                    renamed_count += 1
-                    if verbose:
-                        click.echo(f'{new_name}: {os.path.join(root, new_name[:10])}...')
-                else:
-                    retained_files.append(full_path)
+        for entry in files:
+            full_path = entry.path
+            new_name = strip_hash(entry.name, formats, matcher)
+            if not new_name:
+                continue
 
-        if not recursive:
-            break
+            if new_name not in claimed:
+                claimed[new_name] = full_path
+                moves.append(Move(full_path, os.path.join(root, new_name), True))
+            elif dedupe and is_same_content(full_path, claimed[new_name], digests):
+                duplicates.append(Move(full_path, None, True))
+            else:
+                retained_files.append(full_path)
 
-    return renamed_count, processed_dirs, retained_files
+    return moves + duplicates, retained_files
 
 
 @click.command()
 @click.argument('directory', type=click.Path(exists=True))
 @click.option('-r', '--recursive', is_flag=True, help='Process directories recursively')
 @click.option('-f', '--format', default='mp4', help='File formats to process (comma-separated)')
-@click.option('-p', '--prefix', default='-', help='Prefix before the hash')
+@click.option('-p', '--prefix', default='-', help='Prefixes before the hash (comma-separated)')
+@click.option('-s', '--style', 'styles', default='alnum', help=f'Hash styles to match (comma-separated): '
+                                                               f'{", ".join(HASH_STYLES)}')
+@click.option('-d', '--dedupe', is_flag=True, help='Delete files whose stripped name is taken by an identical file. '
+                                                   'Deleted files cannot be restored with --undo')
+@click.option('-w', '--workers', type=click.IntRange(min=1, max=64), default=4, show_default=True,
+              help='Number of folders renamed at the same time')
+@click.option('--dry-run', is_flag=True, help='Show the planned renames without changing anything')
+@click.option('--resume', is_flag=True, help='Continue an interrupted run from its journal')
+@click.option('--undo', is_flag=True, help='Restore the original names from the last run')
+@click.option('--journal', type=click.Path(dir_okay=False, path_type=Path), help='Journal file to use')
 @click.option('-v', '--verbose', is_flag=True, help='Show verbose info')
-def main(directory: str, recursive: bool, format: str, prefix: str, verbose: bool):  # noqa
+def main(directory: str, recursive: bool, format: str, prefix: str, styles: str, dedupe: bool,  # noqa
+         workers: int, dry_run: bool, resume: bool, undo: bool, journal: Path | None, verbose: bool):
     """
     Rename files by removing any hash patterns at the end of the filename. Follows the format "-<HASH HERE>".
     Defaults to mp4 files.
     """
-    skip_dirs = ['.thumbnails']
-    if not os.path.isdir(directory) or directory in skip_dirs:
+    if not os.path.isdir(directory) or os.path.basename(directory) in SKIP_DIRS:
         click.echo(f"Error: The directory '{directory}' does not exist.")
         sys.exit(1)
 
-    formats = [fmt.lower() for fmt in format.split(',')]
-    renamed, dirs, retained = process_directory(directory, formats, recursive, prefix, verbose)
+    style_list = [i.strip().lower() for i in styles.split(',')]
+    if unknown := [i for i in style_list if i not in HASH_STYLES]:
+        raise click.BadParameter(f'Unknown hash style: {", ".join(unknown)}', param_hint='--style')
+
+    retained: list[str] = []
+
+    def _make_plan() -> MovePlan:
+        formats = extensions(format.split(','))
+        matcher = build_matcher(prefix.split(','), style_list)
+        moves, retained_files = plan_renames(directory, formats, recursive, matcher, dedupe, workers)
+        retained.extend(retained_files)
+        return MovePlan(moves)
+
+    plan, count, errors = run_journaled(Journal(journal or journal_path('striphash', directory)), _make_plan,
+                                        dry_run=dry_run, resume=resume, undo=undo, workers=workers, per_folder=True,
+                                        verbose=verbose, paths=[directory])
+
+    # The plan still holds the state from before this run, so these are the steps that were just attempted
+    indexes = plan.reversible if undo else plan.pending
+    deletions = sum(plan.moves[i].dst is None for i in indexes)
+    renames = len(indexes) - deletions
+    deleted = 0 if dry_run else deletions - len(errors.get('undeleted', []))
 
     if retained:
         click.echo('Some files were retained:')
         for i in retained:
             click.echo(f'  {i}')
-    click.echo(f"\nRenamed {renamed} file(s) in {dirs} folder(s).")
+    for key, paths in errors.items():
+        click.echo(f'Some files were {key}:')
+        for i in paths:
+            click.echo(f'  {i}')
+
+    dirs = len({os.path.dirname(i.src) for i in plan.moves if i.dst is not None})
+    if dry_run:
+        click.echo(f"\nWould {'restore' if undo else 'rename'} {renames} file(s) in {dirs} folder(s).")
+        if deletions:
+            click.echo(f"Would delete {deletions} duplicate file(s).")
+    elif undo:
+        click.echo(f"\nRestored {count} file(s) in {dirs} folder(s).")
+    else:
+        click.echo(f"\nRenamed {count - deleted} file(s) in {dirs} folder(s).")
+    if deleted:
+        click.echo(f"Deleted {deleted} duplicate file(s).")
+    if undo and plan.deleted:
+        click.echo(f"{len(plan.deleted)} deleted duplicate file(s) cannot be restored.")
 
 
 if __name__ == "__main__":
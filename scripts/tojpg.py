@@ -8,18 +8,16 @@ import random
 import string
 from rich.console import Console
 
+from utils.scan import extensions, scan
+
 
 console = Console()
 JPG_QUALITY = 95
 
 
 def scan_for_files(folder_path: Path, formats: List[str], recursive: bool) -> List[Path]:
-    """Get all image files of specified formats from the folder."""
-    pattern = "**/*." if recursive else "*."
-    files: List[Path] = []
-    for fmt in formats:
-        files.extend(folder_path.glob(f"{pattern}{fmt}"))
-    return sorted(files)
+    """Get all image files of specified formats from the folder in a single walk."""
+    return sorted(Path(i.path) for i in scan(folder_path, extensions(formats), recursive))
 
 
 def generate_unique_filename(original_path: Path) -> Path:
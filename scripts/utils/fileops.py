@@ -0,0 +1,119 @@
+import os, errno, shutil, hashlib      # noqa
+
+
+COPY_CHUNK = 1 << 24        # 16 MiB per kernel copy call
+
+
+def same_device(src: str, dst_dir: str) -> bool:
+    """Check if a rename from src into dst_dir stays on one filesystem."""
+    return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    Copy using copy_file_range, falling back to sendfile. Both stay in kernel space so the data never passes
+    through a Python buffer. Source offsets are always explicit so the read position of src_fd never moves.
+    Returns False if neither is supported for this pair of files.
+    """
+    for func in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if func is None:
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                if func is os.sendfile:
+                    sent = func(dst_fd, src_fd, offset, min(COPY_CHUNK, size - offset))
+                else:
+                    sent = func(src_fd, dst_fd, min(COPY_CHUNK, size - offset), offset, offset)
+                if not sent:
+                    break
+                offset += sent
+            return True
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP):
+                raise
+            if offset:
+                # Partial copy, rewind both files and let the next strategy start clean
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+    return False
+
+
+def copy_file(src: str, dst: str) -> str:
+    """Copy a single file with its metadata. Signature matches shutil's copy_function."""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if not _kernel_copy(fsrc.fileno(), fdst.fileno(), size):
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK)
+        fdst.flush()
+        # move_path deletes the source next, so never report a short copy as done
+        if (copied := os.fstat(fdst.fileno()).st_size) != size:
+            raise OSError(errno.EIO, f'Copied {copied} of {size} bytes', dst)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def move_path(src: str, dst: str, same_dev: bool | None = None) -> str:
+    """
+    Move a file or folder. Renames when both paths share a device, otherwise copies through the kernel and
+    deletes the source once the copy is complete.
+    """
+    if same_dev is None:
+        same_dev = same_device(src, os.path.dirname(dst) or '.')
+
+    if same_dev:
+        os.rename(src, dst)
+        return dst
+
+    # Copy under a temporary name and rename it into place, dst only ever appears once the copy is complete
+    folder, name = os.path.split(dst)
+    part = os.path.join(folder, f'.{name}.part')
+    _remove(part)     # Left over from a crash mid-copy
+    try:
+        if os.path.isdir(src) and not os.path.islink(src):
+            shutil.copytree(src, part, symlinks=True, copy_function=copy_file)
+        elif os.path.islink(src):
+            os.symlink(os.readlink(src), part)
+        else:
+            copy_file(src, part)
+        os.rename(part, dst)
+    except BaseException:
+        _remove(part)
+        raise
+
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.rmtree(src)
+    else:
+        os.unlink(src)
+    return dst
+
+
+def _remove(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+def is_copy_of(src: str, dst: str) -> bool:
+    """True when dst is a finished cross-device copy of src, i.e. a move that stopped before unlinking src."""
+    if os.path.islink(src) or os.path.islink(dst):
+        return os.path.islink(src) and os.path.islink(dst) and os.readlink(src) == os.readlink(dst)
+    return os.path.isfile(src) and os.path.isfile(dst) and os.path.getsize(src) == os.path.getsize(dst)
+
+
+def file_digest(path: str, cache: dict[str, bytes]) -> bytes:
+    if path not in cache:
+        with open(path, 'rb') as f:
+            cache[path] = hashlib.file_digest(f, 'blake2b').digest()
+    return cache[path]
+
+
+def is_same_content(first: str, second: str, cache: dict[str, bytes]) -> bool:
+    """Compare by size first so the files are only read when a hash can decide."""
+    if not (os.path.isfile(first) and os.path.isfile(second)):
+        return False
+    if os.path.getsize(first) != os.path.getsize(second):
+        return False
+    return file_digest(first, cache) == file_digest(second, cache)
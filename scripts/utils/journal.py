@@ -0,0 +1,289 @@
+import os, json, click, hashlib, threading       # noqa
+from pathlib import Path
+from typing import NamedTuple, Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from .fileops import move_path, is_copy_of
+
+
+JOURNAL_DIR = Path.home() / '.cache' / 'scripts'
+
+
+class Move(NamedTuple):
+    """A dst of None deletes src. Deletions are journaled like moves but cannot be undone."""
+    src: str
+    dst: str | None
+    same_dev: bool
+
+
+def resolve_paths(*paths: str | os.PathLike) -> list[str]:
+    return [os.path.realpath(i) for i in paths]
+
+
+def journal_path(prog_name: str, *paths: str | os.PathLike) -> Path:
+    """
+    Default journal location. Kept out of the folders being reorganized so it never gets moved itself, and keyed
+    on the resolved input and output paths so runs over different folders never share a journal.
+    """
+    if not paths:
+        return JOURNAL_DIR / f'{prog_name}.journal'
+    digest = hashlib.sha1('\0'.join(resolve_paths(*paths)).encode()).hexdigest()[:12]
+    return JOURNAL_DIR / f'{prog_name}-{digest}.journal'
+
+
+class MovePlan:
+    """Every move of a run, resolved up front. Indexes into moves are what the journal records."""
+
+    def __init__(self, moves: list[Move], meta: dict | None = None):
+        self.moves = moves
+        self.meta = meta or {}
+        self.done: set[int] = set()
+        self.undone: set[int] = set()
+
+    @property
+    def pending(self) -> list[int]:
+        return [i for i in range(len(self.moves)) if i not in self.done]
+
+    @property
+    def complete(self) -> bool:
+        return len(self.done) == len(self.moves)
+
+    @property
+    def reversible(self) -> list[int]:
+        return sorted((i for i in self.done - self.undone if self.moves[i].dst is not None), reverse=True)
+
+    @property
+    def deleted(self) -> list[int]:
+        return sorted(i for i in self.done if self.moves[i].dst is None)
+
+    @property
+    def unfinished(self) -> bool:
+        """Partly applied and not undone. Starting over would lose track of what already moved."""
+        return bool(self.pending) and bool(self.reversible)
+
+
+class Journal:
+    """
+    Append-only log of a MovePlan. The plan is written and synced before the first move, after that one line is
+    appended per finished move and the file is fsynced every `sync_every` lines instead of on every write.
+    """
+
+    def __init__(self, path: Path, sync_every: int = 256):
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self._fp = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def load(self) -> MovePlan | None:
+        """Read a journal back. Returns None if the plan itself was never fully written."""
+        if not self.exists():
+            return None
+
+        meta, moves, total = {}, [], None
+        done, undone = set(), set()
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break   # Torn last line from a crash
+                if 'done' in record:
+                    done.add(record['done'])
+                elif 'undone' in record:
+                    undone.add(record['undone'])
+                elif 'src' in record:
+                    moves.append(Move(record['src'], record['dst'], record['dev']))
+                elif 'planned' in record:
+                    total = record['planned']
+                elif 'meta' in record:
+                    meta = record['meta']
+
+        if total is None or total != len(moves):
+            return None
+        plan = MovePlan(moves, meta)
+        plan.done, plan.undone = done, undone
+        return plan
+
+    def start(self, plan: MovePlan):
+        """Replace any previous journal with a new plan."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = open(self.path, 'w', encoding='utf-8')
+        self._fp.write(json.dumps({'meta': plan.meta}) + '\n')
+        for move in plan.moves:
+            self._fp.write(json.dumps({'src': move.src, 'dst': move.dst, 'dev': move.same_dev}) + '\n')
+        self._fp.write(json.dumps({'planned': len(plan.moves)}) + '\n')
+        self.sync()
+
+    def reopen(self):
+        self._fp = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, key: str, idx: int):
+        with self._lock:
+            self._fp.write(f'{{"{key}": {idx}}}\n')
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self.sync()
+
+    def sync(self):
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if self._fp:
+            self.sync()
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _folder(move: Move, reverse: bool) -> str:
+    """The folder a move writes into, or the folder a deletion removes from."""
+    return os.path.dirname(move.src if reverse or move.dst is None else move.dst)
+
+
+def _run(plan: MovePlan, indexes: list[int], journal: Journal | None, workers: int, key: str,
+         reverse: bool, per_folder: bool, verbose: bool = False) -> tuple[int, dict[str, list]]:
+    errors: dict[str, list] = {}
+    lock = threading.Lock()
+
+    # Create every destination folder once instead of once per file
+    for folder in {_folder(plan.moves[i], reverse) for i in indexes if plan.moves[i].dst is not None}:
+        os.makedirs(folder, exist_ok=True)
+
+    def _delete(idx: int) -> bool:
+        src = plan.moves[idx].src
+        try:
+            # Gone already when a crash hit before the deletion was journaled
+            if os.path.lexists(src):
+                os.unlink(src)
+        except OSError:
+            with lock:
+                errors.setdefault('undeleted', []).append(src)
+            return False
+        if journal:
+            journal.record(key, idx)
+        if verbose:
+            click.echo(f'Deleted {src}')
+        return True
+
+    def _move(idx: int) -> bool:
+        src, dst, same_dev = plan.moves[idx]
+        if dst is None:
+            return _delete(idx)
+        if reverse:
+            src, dst = dst, src
+        try:
+            # Already moved before a crash but not yet journaled
+            if not os.path.lexists(src) and os.path.lexists(dst):
+                pass
+            elif os.path.lexists(dst):
+                # Copied across devices before a crash but the source was never unlinked
+                if same_dev or not is_copy_of(src, dst):
+                    raise FileExistsError(dst)
+                os.unlink(src)
+            else:
+                move_path(src, dst, same_dev)
+        except Exception:   # noqa
+            with lock:
+                errors.setdefault('unmoved', []).append(src)
+            return False
+        if journal:
+            journal.record(key, idx)
+        if verbose:
+            click.echo(f'{src} -> {dst}')
+        return True
+
+    if workers <= 1:
+        count = sum(map(_move, indexes))
+    elif per_folder:
+        # One worker per destination folder so threads never contend on the same directory
+        groups: dict[str, list[int]] = {}
+        for idx in indexes:
+            groups.setdefault(_folder(plan.moves[idx], reverse), []).append(idx)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            count = sum(executor.map(lambda group: sum(map(_move, group)), groups.values()))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            count = sum(executor.map(_move, indexes))
+    return count, errors
+
+
+def run_plan(plan: MovePlan, journal: Journal | None = None, workers: int = 1,
+             per_folder: bool = False, verbose: bool = False) -> tuple[int, dict[str, list]]:
+    """Run the moves not yet marked done. Returns the number moved or deleted and any errors."""
+    return _run(plan, plan.pending, journal, workers, 'done', False, per_folder, verbose)
+
+
+def undo_plan(plan: MovePlan, journal: Journal | None = None, workers: int = 1,
+              per_folder: bool = False, verbose: bool = False) -> tuple[int, dict[str, list]]:
+    """
+    Move every completed entry back to where it came from, newest first. Deletions are skipped.
+    Folders listed under meta['created'] are removed if the undo leaves them empty.
+    """
+    count, errors = _run(plan, plan.reversible, journal, workers, 'undone', True, per_folder, verbose)
+    for folder in sorted(plan.meta.get('created', []), reverse=True):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
+    return count, errors
+
+
+def print_plan(plan: MovePlan, indexes: list[int] | None = None, reverse: bool = False):
+    for idx in plan.pending if indexes is None else indexes:
+        src, dst, _ = plan.moves[idx]
+        if dst is None:
+            click.echo(f'Delete {src}')
+        else:
+            click.echo(f'{dst} -> {src}' if reverse else f'{src} -> {dst}')
+
+
+def run_journaled(journal: Journal, make_plan: Callable[[], MovePlan], dry_run: bool = False, resume: bool = False,
+                  undo: bool = False, workers: int = 1, per_folder: bool = False, verbose: bool = False,
+                  paths: list[str] | None = None) -> tuple[MovePlan, int, dict[str, list]]:
+    """
+    Shared --dry-run/--resume/--undo handling. make_plan is only called for a fresh run so resuming or undoing
+    never rescans the filesystem. With verbose every step is echoed as it completes. The resolved `paths` are
+    stored with the plan and a journal written for other paths is never resumed or undone.
+    """
+    paths = resolve_paths(*paths) if paths else None
+    if resume or undo:
+        if not (plan := journal.load()):
+            raise click.ClickException(f'No usable journal found at {journal.path}')
+        if paths and plan.meta.get('paths') != paths:
+            raise click.ClickException(f'The journal at {journal.path} was written for '
+                                       f'{", ".join(plan.meta.get("paths") or ["other paths"])}')
+    else:
+        if (previous := journal.load()) and previous.unfinished:
+            raise click.ClickException(f'Unfinished run found in {journal.path}. Use --resume or --undo first.')
+        plan = make_plan()
+        if paths:
+            plan.meta['paths'] = paths
+
+    if dry_run:
+        if undo:
+            print_plan(plan, plan.reversible, reverse=True)
+        else:
+            print_plan(plan)
+        return plan, 0, {}
+
+    if resume or undo:
+        journal.reopen()
+    else:
+        journal.start(plan)
+    with journal:
+        if undo:
+            count, errors = undo_plan(plan, journal, workers, per_folder, verbose)
+        else:
+            count, errors = run_plan(plan, journal, workers, per_folder, verbose)
+    return plan, count, errors
@@ -0,0 +1,503 @@
+import os, re, csv, glob, time, struct, hashlib, tempfile        # noqa
+from typing import BinaryIO, Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyPDF2 import PdfReader
+from PyPDF2.errors import FileNotDecryptedError, PdfReadError, WrongPasswordError
+from PyPDF2.generic import (ArrayObject, ByteStringObject, DictionaryObject, IndirectObject, NameObject,
+                            NumberObject, PdfObject, StreamObject, TextStringObject, read_object)
+from PyPDF2._encryption import AlgV5, CryptBase, CryptRC4, Encryption, AES_CBC_encrypt, AES_ECB_encrypt
+from PyPDF2._security import _alg33, _alg35
+
+
+PERMISSIONS = (2 ** 31 - 1) - 3     # Everything allowed, same as PyPDF2's default
+SKIP_TYPES = frozenset({'/ObjStm', '/XRef'})
+
+
+class Rc4Encryption:
+    """
+    Standard security handler, RC4 128-bit (V2 R3). Matches what PdfWriter.encrypt produces. The key depends on
+    the file ID, so every file needs its own instance, see for_file.
+    """
+    min_version = '1.4'
+
+    def __init__(self, user_password: str, owner_password: str | None = None, file_id: bytes = b''):
+        self.passwords = user_password, owner_password
+        self.file_id = file_id or os.urandom(16)
+        self.owner = ByteStringObject(_alg33(owner_password or user_password, user_password, 3, 16))
+        self.user, self.key = _alg35(user_password, 3, 16, self.owner, PERMISSIONS,
+                                     ByteStringObject(self.file_id), False)
+
+    def dictionary(self) -> DictionaryObject:
+        return DictionaryObject({
+            NameObject('/Filter'): NameObject('/Standard'),
+            NameObject('/V'): NumberObject(2),
+            NameObject('/R'): NumberObject(3),
+            NameObject('/Length'): NumberObject(128),
+            NameObject('/O'): ByteStringObject(self.owner),
+            NameObject('/U'): ByteStringObject(self.user),
+            NameObject('/P'): NumberObject(PERMISSIONS),
+        })
+
+    def crypt(self, idnum: int, generation: int) -> CryptBase:
+        # Algorithm 1: the file key extended with the object number and generation
+        data = self.key + struct.pack('<i', idnum)[:3] + struct.pack('<i', generation)[:2]
+        return CryptRC4(hashlib.md5(data).digest()[:min(len(self.key) + 5, 16)])
+
+    def for_file(self) -> 'Rc4Encryption':
+        # Sharing a key between files would reuse the RC4 keystream, so derive again with a new ID. It's cheap.
+        return Rc4Encryption(*self.passwords)
+
+
+class CryptAes256(CryptBase):
+    """AES-256-CBC with PKCS#7 padding and a random IV in front, as Algorithm 1.A wants it."""
+
+    def __init__(self, key: bytes):
+        self.key = key
+
+    def encrypt(self, data: bytes) -> bytes:
+        iv = os.urandom(16)
+        padding = 16 - len(data) % 16
+        return iv + AES_CBC_encrypt(self.key, iv, data + bytes([padding]) * padding)
+
+
+class Aes256Encryption:
+    """
+    Standard security handler, AES-256 (V5 R6). Each of U, UE, O and OE runs the R6 hash, at least 64 rounds of
+    AES plus SHA-2, which dominates the cost of small files. The spec leaves the file key and salts to the writer,
+    so one instance is derived per password and reused for every file of a batch. Every string and stream still
+    gets its own random IV. Needs PyCryptodome, like AES decryption in PyPDF2.
+    """
+    min_version = '1.7'
+    file_id = None
+
+    def __init__(self, user_password: str, owner_password: str | None = None):
+        user = user_password.encode()[:127]
+        owner = (owner_password or user_password).encode()[:127]
+        zero_iv = bytes(16)
+        self.key = os.urandom(32)
+
+        validation_salt, key_salt = os.urandom(8), os.urandom(8)
+        self.user = AlgV5.calculate_hash(6, user, validation_salt, b'') + validation_salt + key_salt
+        self.user_key = AES_CBC_encrypt(AlgV5.calculate_hash(6, user, key_salt, b''), zero_iv, self.key)
+
+        validation_salt, key_salt = os.urandom(8), os.urandom(8)
+        self.owner = AlgV5.calculate_hash(6, owner, validation_salt, self.user) + validation_salt + key_salt
+        self.owner_key = AES_CBC_encrypt(AlgV5.calculate_hash(6, owner, key_salt, self.user), zero_iv, self.key)
+
+        perms = struct.pack('<I', PERMISSIONS) + b'\xff\xff\xff\xffTadb' + os.urandom(4)
+        self.perms = AES_ECB_encrypt(self.key, perms)
+        self._crypt = CryptAes256(self.key)
+
+    def dictionary(self) -> DictionaryObject:
+        std_cf = DictionaryObject({
+            NameObject('/AuthEvent'): NameObject('/DocOpen'),
+            NameObject('/CFM'): NameObject('/AESV3'),
+            NameObject('/Length'): NumberObject(32),
+        })
+        return DictionaryObject({
+            NameObject('/Filter'): NameObject('/Standard'),
+            NameObject('/V'): NumberObject(5),
+            NameObject('/R'): NumberObject(6),
+            NameObject('/Length'): NumberObject(256),
+            NameObject('/CF'): DictionaryObject({NameObject('/StdCF'): std_cf}),
+            NameObject('/StmF'): NameObject('/StdCF'),
+            NameObject('/StrF'): NameObject('/StdCF'),
+            NameObject('/O'): ByteStringObject(self.owner),
+            NameObject('/U'): ByteStringObject(self.user),
+            NameObject('/OE'): ByteStringObject(self.owner_key),
+            NameObject('/UE'): ByteStringObject(self.user_key),
+            NameObject('/P'): NumberObject(PERMISSIONS),
+            NameObject('/Perms'): ByteStringObject(self.perms),
+        })
+
+    def crypt(self, idnum: int, generation: int) -> CryptBase:
+        return self._crypt
+
+    def for_file(self) -> 'Aes256Encryption':
+        return self
+
+
+ALGORITHMS = {'RC4-128': Rc4Encryption, 'AES-256': Aes256Encryption}
+V5_KEYS: dict[tuple[bytes, ...], tuple] = {}        # (password, O, U, OE, UE) -> verified key and password type
+
+
+def unlock(reader: PdfReader, password: str) -> bool:
+    """
+    Decrypt with password. For AES-256 files the derived key is remembered by password and O/U/OE/UE, so a batch
+    of files written with the same encryption dictionary pays for the R6 hash once per process.
+    """
+    encryption = reader._encryption     # noqa
+    if encryption.algV < 5:
+        return bool(reader.decrypt(password))
+    secret = password.encode()[:127]
+    cache_key = (secret, *(encryption.entry[i].get_object().original_bytes for i in ('/O', '/U', '/OE', '/UE')))
+    if cache_key in V5_KEYS:
+        encryption._key, encryption._password_type = V5_KEYS[cache_key]     # noqa
+        return True
+    if not encryption.verify(secret):
+        return False
+    V5_KEYS[cache_key] = encryption._key, encryption._password_type         # noqa
+    return True
+
+
+def encrypt_object(obj: PdfObject, crypt: CryptBase) -> PdfObject:
+    """Encrypt every string and stream inside obj in place. Returns obj, or its replacement for strings."""
+    if isinstance(obj, (ByteStringObject, TextStringObject)):
+        return ByteStringObject(crypt.encrypt(obj.original_bytes))
+    if isinstance(obj, StreamObject):
+        obj._data = crypt.encrypt(obj._data)
+    if isinstance(obj, DictionaryObject):
+        for key, value in list(obj.items()):
+            obj[key] = encrypt_object(value, crypt)
+    elif isinstance(obj, ArrayObject):
+        for i, value in enumerate(obj):
+            obj[i] = encrypt_object(value, crypt)
+    return obj
+
+
+def object_ids(reader: PdfReader) -> list[tuple[int, int]]:
+    """
+    Every live object as (idnum, generation). Plain objects come first in file order so reads are sequential,
+    then objects grouped by their object stream so each stream is decoded once.
+    """
+    plain = [(offset, idnum, generation) for generation, entries in reader.xref.items()
+             for idnum, offset in entries.items()
+             if idnum not in reader.xref_objStm and not reader.xref_free_entry.get(generation, {}).get(idnum)]
+    packed = sorted((stream, index, idnum) for idnum, (stream, index) in reader.xref_objStm.items())
+    return [(idnum, generation) for _, idnum, generation in sorted(plain)] + [(idnum, 0) for *_, idnum in packed]
+
+
+def write_object(out: BinaryIO, idnum: int, generation: int, obj: PdfObject):
+    out.write(f'{idnum} {generation} obj\n'.encode())
+    obj.write_to_stream(out, None)
+    out.write(b'\nendobj\n')
+
+
+def page_count(reader: PdfReader) -> int:
+    """Read from the catalog so the page tree is never walked."""
+    return int(reader.trailer['/Root']['/Pages'].get('/Count', 0))
+
+
+def stream_copy(reader: PdfReader, out: BinaryIO, encryption: Rc4Encryption | Aes256Encryption | None = None):
+    """
+    Copy every object of reader to out one at a time, decrypted, and optionally encrypted again. Object numbers
+    are kept so shared fonts and images stay shared, and each object is dropped from the reader's cache once
+    written, so memory is bounded by the largest single object rather than the document.
+    """
+    trailer = reader.trailer
+    old_encrypt = trailer.raw_get('/Encrypt') if '/Encrypt' in trailer else None
+    skip = {old_encrypt.idnum} if isinstance(old_encrypt, IndirectObject) else set()
+
+    version = reader.pdf_header.removeprefix('%PDF-') or '1.7'
+    if encryption:
+        version = max(version, encryption.min_version, key=float)
+    out.write(f'%PDF-{version}\n'.encode() + b'%\xe2\xe3\xcf\xd3\n')
+
+    offsets: dict[int, tuple[int, int]] = {}
+    current_stream = None
+    for idnum, generation in object_ids(reader):
+        if idnum in skip:
+            continue
+        if idnum in reader.xref_objStm and reader.xref_objStm[idnum][0] != current_stream:
+            # Only the object stream being read stays cached
+            reader.resolved_objects.pop((0, current_stream), None)
+            current_stream = reader.xref_objStm[idnum][0]
+        obj = reader.get_object(IndirectObject(idnum, generation, reader))
+        reader.resolved_objects.pop((generation, idnum), None)
+        if obj is None or (isinstance(obj, StreamObject) and obj.get('/Type') in SKIP_TYPES):
+            continue
+        if encryption:
+            obj = encrypt_object(obj, encryption.crypt(idnum, generation))
+        offsets[idnum] = out.tell(), generation
+        write_object(out, idnum, generation, obj)
+
+    size = max(offsets, default=0) + 1
+    new_trailer = DictionaryObject({NameObject('/Root'): trailer.raw_get('/Root')})
+    if '/Info' in trailer:
+        new_trailer[NameObject('/Info')] = trailer.raw_get('/Info')
+    file_id = trailer.get('/ID')
+    if encryption:
+        offsets[size] = out.tell(), 0
+        write_object(out, size, 0, encryption.dictionary())
+        new_trailer[NameObject('/Encrypt')] = IndirectObject(size, 0, None)
+        size += 1
+        if encryption.file_id or not file_id:
+            file_id = ArrayObject([ByteStringObject(encryption.file_id or os.urandom(16))] * 2)
+    if file_id:
+        new_trailer[NameObject('/ID')] = file_id
+    new_trailer[NameObject('/Size')] = NumberObject(size)
+
+    xref = out.tell()
+    out.write(f'xref\n0 {size}\n'.encode())
+    out.write(b''.join(b'%010d %05d n \n' % offsets[i] if i in offsets else b'0000000000 65535 f \n'
+                       for i in range(size)))
+    out.write(b'trailer\n')
+    new_trailer.write_to_stream(out, None)
+    out.write(f'\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+
+def rewrite_pdf(src: str, dst: str | None = None, password: str | None = None,
+                encryption: Rc4Encryption | Aes256Encryption | None = None) -> int:
+    """
+    Rewrite src into dst (default: src itself), decrypting with password when the file is encrypted and applying
+    encryption if given. Output goes to a temp file next to dst and is renamed over it only once complete, so a
+    failure never leaves a truncated file behind. Returns the page count.
+    """
+    dst = dst or src
+    with open(src, 'rb') as f:
+        reader = PdfReader(f)
+        if reader.is_encrypted and not reader._encryption.is_decrypted():     # noqa
+            # Files with an empty user password are already open at this point
+            if password is None:
+                raise FileNotDecryptedError('Password required')
+            if not unlock(reader, password):
+                raise WrongPasswordError('Wrong password')
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)), prefix='.pdf-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb', buffering=1 << 20) as out:
+                stream_copy(reader, out, encryption)
+                out.flush()
+                os.fsync(out.fileno())
+            os.chmod(tmp, os.stat(src).st_mode & 0o7777)
+            os.replace(tmp, dst)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return page_count(reader)
+
+
+def read_password(prompt: str, fd: int | None = None) -> str:
+    """Ask once on the terminal, or take the first line from an already open file descriptor."""
+    if fd is None:
+        import getpass
+        return getpass.getpass(prompt)
+    with os.fdopen(fd, 'r', closefd=False) as f:
+        return f.readline().rstrip('\r\n')
+
+
+WHITESPACE = b' \t\r\n\x00\x0c'
+OBJECT_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+XREF_ROW = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+FREE, IN_STREAM = -1, -2
+
+
+class MetadataReader:
+    """
+    Just enough of a PDF reader to get the trailer and the objects it points at. Starts from startxref, follows
+    /Prev and /XRefStm, and looks single objects up in the xref tables or streams without loading every entry,
+    the object tree or any page. Only handles well-formed files, callers fall back to PdfReader on errors.
+    """
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.lookups = []
+        self.trailer = DictionaryObject()
+        pending, seen = [self._startxref()], set()
+        while pending:
+            offset = pending.pop(0)
+            if offset in seen:
+                continue
+            seen.add(offset)
+            trailer = self._section(offset)
+            for key, value in trailer.items():
+                if key not in self.trailer:
+                    dict.__setitem__(self.trailer, key, value)
+            pending.extend(int(trailer.raw_get(i)) for i in ('/XRefStm', '/Prev') if i in trailer)
+
+    def _startxref(self) -> int:
+        self.f.seek(0, os.SEEK_END)
+        size = self.f.tell()
+        self.f.seek(max(0, size - 2048))
+        tail = self.f.read()
+        match = re.search(rb'startxref\s+(\d+)', tail[tail.rfind(b'startxref'):])
+        if not match:
+            raise PdfReadError('startxref not found')
+        return int(match[1])
+
+    def _line(self) -> tuple[int, bytes]:
+        while (c := self.f.read(1)) and c in WHITESPACE:
+            pass
+        start, line = self.f.tell() - 1, bytearray(c)
+        while (c := self.f.read(1)) and c not in b'\r\n':
+            line += c
+        return start, bytes(line)
+
+    def _read(self) -> PdfObject:
+        while (c := self.f.read(1)) and c in WHITESPACE:
+            pass
+        self.f.seek(-1, os.SEEK_CUR)
+        return read_object(self.f, self)
+
+    def _object_at(self, offset: int) -> PdfObject:
+        self.f.seek(offset)
+        match = OBJECT_HEADER.match(self.f.read(64))
+        if not match:
+            raise PdfReadError(f'No object at {offset}')
+        self.f.seek(offset + match.end())
+        return self._read()
+
+    def _section(self, offset: int) -> DictionaryObject:
+        self.f.seek(offset)
+        if self.f.read(4) != b'xref':
+            return self._xref_stream(offset)
+
+        # Classic table, rows are 20 bytes each so subsections are skipped rather than read
+        subsections = []
+        start, line = self._line()
+        while not line.startswith(b'trailer'):
+            first, count = map(int, line.split()[:2])
+            subsections.append((first, count, self.f.tell()))
+            self.f.seek(count * 20, os.SEEK_CUR)
+            start, line = self._line()
+        self.f.seek(start + len(b'trailer'))
+        trailer = self._read()
+
+        def lookup(idnum: int) -> int | None:
+            for first, count, position in subsections:
+                if first <= idnum < first + count:
+                    self.f.seek(position + (idnum - first) * 20)
+                    row = XREF_ROW.match(self.f.read(20).lstrip(b'\r\n'))
+                    if not row:
+                        raise PdfReadError(f'Bad xref row for object {idnum}')
+                    return int(row[1]) if row[3] == b'n' else FREE
+            return None
+
+        self.lookups.append(lookup)
+        return trailer
+
+    def _xref_stream(self, offset: int) -> DictionaryObject:
+        stream = self._object_at(offset)
+        if not isinstance(stream, StreamObject) or stream.get('/Type') != '/XRef':
+            raise PdfReadError(f'No xref at {offset}')
+        data = stream.get_data()
+        widths = [int(i) for i in stream['/W']]
+        index = [int(i) for i in stream.get('/Index', [0, stream['/Size']])]
+        row_size = sum(widths)
+
+        def lookup(idnum: int) -> int | None:
+            row = 0
+            for first, count in zip(index[::2], index[1::2]):
+                if first <= idnum < first + count:
+                    position, fields = (row + idnum - first) * row_size, []
+                    for width in widths:
+                        fields.append(int.from_bytes(data[position:position + width], 'big'))
+                        position += width
+                    kind = fields[0] if widths[0] else 1
+                    return fields[1] if kind == 1 else IN_STREAM if kind == 2 else FREE
+                row += count
+            return None
+
+        self.lookups.append(lookup)
+        return stream
+
+    def get_object(self, reference: int | IndirectObject) -> PdfObject:
+        idnum = reference if isinstance(reference, int) else reference.idnum
+        for lookup in self.lookups:
+            if (offset := lookup(idnum)) is not None:
+                break
+        else:
+            raise PdfReadError(f'Object {idnum} not in xref')
+        if offset < 0:
+            # The encryption dictionary may not sit in an object stream, anything else is left to PdfReader
+            raise PdfReadError(f'Object {idnum} is free or compressed')
+        return self._object_at(offset)
+
+
+def encryption_name(entry: DictionaryObject) -> str:
+    version = int(entry.get('/V', 0))
+    if version >= 5:
+        return 'AES-256'
+    if version == 4:
+        method = entry['/CF'][entry['/StmF']].get('/CFM') if entry.get('/StmF') in entry.get('/CF', {}) else None
+        return 'AES-128' if method == '/AESV2' else 'RC4-128'
+    return f"RC4-{int(entry.get('/Length', 40))}"
+
+
+def check_file(path: str) -> dict:
+    """
+    Classify a PDF from its trailer and /Encrypt dictionary alone: open, owner-only (restrictions but an empty
+    user password, so it opens without one) or encrypted (needs a password).
+    """
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        try:
+            trailer = MetadataReader(f).trailer
+            entry = trailer['/Encrypt'] if '/Encrypt' in trailer else None
+        except Exception:       # noqa
+            # Damaged or unusual layouts: PdfReader still only parses the xref here, never the pages
+            reader = PdfReader(f)
+            trailer = reader.trailer
+            entry = trailer['/Encrypt'].get_object() if reader.is_encrypted else None
+        result = dict(path=path, status='open', pages=None, encryption='')
+        if entry is not None:
+            file_id = trailer.get('/ID')
+            encryption = Encryption.read(entry, file_id[0].original_bytes if file_id else b'')
+            result['status'] = 'owner-only' if encryption.verify(b'') else 'encrypted'
+            result['encryption'] = encryption_name(entry)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def find_pdfs(patterns: tuple[str, ...], recursive: bool = False) -> list[str]:
+    """Expand files, folders and glob patterns into a sorted list of unique PDF paths."""
+    found: dict[str, None] = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=recursive)) or [pattern]:
+            if os.path.isdir(path):
+                search = os.path.join(glob.escape(path), '**' if recursive else '', '*')
+                found.update(dict.fromkeys(i for i in sorted(glob.glob(search, recursive=recursive))
+                                           if i.lower().endswith('.pdf') and os.path.isfile(i)))
+            elif os.path.isfile(path):
+                found[path] = None
+    return list(found)
+
+
+def encrypt_file(path: str, encryption: Rc4Encryption | Aes256Encryption) -> dict:
+    start = time.perf_counter()
+    pages = rewrite_pdf(path, encryption=encryption.for_file())
+    return dict(path=path, status='encrypted', pages=pages, seconds=time.perf_counter() - start)
+
+
+def decrypt_file(path: str, password: str | None, output: str) -> dict:
+    start = time.perf_counter()
+    pages = rewrite_pdf(path, output, password)
+    return dict(path=path, status='decrypted', pages=pages, seconds=time.perf_counter() - start, output=output)
+
+
+def run_batch(func: Callable[..., dict], jobs: list[tuple], workers: int = 1) -> Iterator[dict]:
+    """
+    Call func(*job) for every job, on a process pool when there is more than one worker and job, yielding a
+    result per job as it finishes. Failures come back as a result with status 'failed' instead of stopping the
+    batch.
+    """
+    def failed(job: tuple, e: Exception) -> dict:
+        return dict(path=job[0], status='failed', pages=0, seconds=0, error=f'{type(e).__name__}: {e}')
+
+    if workers < 2 or len(jobs) < 2:
+        for job in jobs:
+            try:
+                yield func(*job)
+            except Exception as e:      # noqa
+                yield failed(job, e)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = {executor.submit(func, *job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:      # noqa
+                yield failed(futures[future], e)
+
+
+REPORT_FIELDS = ['path', 'status', 'encryption', 'pages', 'seconds', 'output', 'error']
+
+
+def write_report(path: str, results: list[dict]):
+    """One CSV row per file, in input order."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in results:
+            writer.writerow({**row, 'seconds': f"{row.get('seconds', 0):.3f}"})
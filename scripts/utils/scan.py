@@ -0,0 +1,98 @@
+import os      # noqa
+from typing import NamedTuple, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+
+SKIP_DIRS = frozenset({'.thumbnails'})
+
+
+class Entry(NamedTuple):
+    path: str
+    name: str
+    stat: os.stat_result | None = None
+
+
+def extensions(formats: Iterable[str]) -> frozenset[str]:
+    """Normalize 'PNG', '.jpg' or ' mp4' into the lowercase, dotless set the scanner matches against."""
+    return frozenset(i.strip().lower().lstrip('.') for i in formats if i.strip())
+
+
+def has_extension(name: str, exts: frozenset[str]) -> bool:
+    return os.path.splitext(name)[1][1:].lower() in exts
+
+
+def scan_dir(folder: str, exts: frozenset[str] | None = None, hidden: bool = True,
+             skip_dirs: frozenset[str] = SKIP_DIRS, with_stat: bool = False,
+             regular: bool = False) -> tuple[list[Entry], list[Entry]]:
+    """
+    One scandir call over a single folder, returning its (dirs, files). Symlinks are never followed into, so
+    a link to a folder is listed with the files unless `regular` limits them to regular files and links to
+    one. The stat is only taken when asked for and is then kept on the entry so callers never stat the same
+    file twice.
+    """
+    dirs: list[Entry] = []
+    files: list[Entry] = []
+    try:
+        it = os.scandir(folder)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return dirs, files
+
+    with it:
+        for i in it:
+            if not hidden and i.name.startswith('.'):
+                continue
+            if i.is_dir(follow_symlinks=False):
+                if i.name not in skip_dirs:
+                    dirs.append(Entry(i.path, i.name))
+                continue
+            if exts is not None and not has_extension(i.name, exts):
+                continue
+            if regular and not i.is_file():
+                continue
+            stat = None
+            if with_stat:
+                try:
+                    stat = i.stat()
+                except OSError:
+                    stat = i.stat(follow_symlinks=False)
+            files.append(Entry(i.path, i.name, stat))
+    return dirs, files
+
+
+def walk(paths: str | os.PathLike | Iterable[str | os.PathLike], exts: frozenset[str] | None = None,
+         recursive: bool = True, hidden: bool = True, skip_dirs: frozenset[str] = SKIP_DIRS,
+         with_stat: bool = False, workers: int = 1,
+         regular: bool = False) -> Iterator[tuple[str, list[Entry], list[Entry]]]:
+    """
+    Yield (folder, dirs, files) for every folder under `paths`, one level at a time. With more than one
+    worker each level is listed in parallel, which pays off on network shares and cold caches. Output order
+    is the same either way.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    level = list(dict.fromkeys(os.fspath(i) for i in paths))
+
+    def _scan(folder: str) -> tuple[list[Entry], list[Entry]]:
+        return scan_dir(folder, exts, hidden, skip_dirs, with_stat, regular)
+
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while level:
+            results = executor.map(_scan, level) if executor else map(_scan, level)
+            children: list[str] = []
+            for folder, (dirs, files) in zip(level, results):
+                yield folder, dirs, files
+                if recursive:
+                    children.extend(i.path for i in dirs)
+            level = children
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+
+def scan(paths: str | os.PathLike | Iterable[str | os.PathLike], exts: frozenset[str] | None = None,
+         recursive: bool = True, hidden: bool = True, skip_dirs: frozenset[str] = SKIP_DIRS,
+         with_stat: bool = False, workers: int = 1, regular: bool = False) -> Iterator[Entry]:
+    """Every file under `paths` that passes the extension, hidden and skip-dir rules."""
+    for _, _, files in walk(paths, exts, recursive, hidden, skip_dirs, with_stat, workers, regular):
+        yield from files
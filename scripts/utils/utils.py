@@ -1,18 +1,85 @@
-import click, os, re        # noqa
+import click, os, re, string        # noqa
 from click_help_colors import HelpColorsCommand, HelpColorsGroup
 from pathlib import Path
+from typing import Iterable
 from pathvalidate import sanitize_filename
 
+from utils.scan import scan
+
 
 command_config = dict(cls=HelpColorsCommand, help_options_color='green', help_headers_color='blue')
 group_config = dict(cls=HelpColorsGroup, help_options_color='green', help_headers_color='blue')
 path_config = click.Path(exists=True, file_okay=False, dir_okay=True, writable=True, path_type=Path, resolve_path=True)
 
+# Everything the regex below removes from an ASCII name, as a single str.translate table
+CLEAN_RE = re.compile(r"[^\w\-.\s]")
+CLEAN_TABLE = str.maketrans('', '', ''.join(i for i in map(chr, range(128))
+                                            if i not in string.ascii_letters + string.digits + '_-. '))
+RESERVED_PREFIXES = ('CON', 'PRN', 'AUX', 'NUL', 'COM', 'LPT', 'CLOCK$')
+
+
+def _needs_sanitize(name: str) -> bool:
+    """Cheap checks for the cases only pathvalidate handles: edges, control chars, reserved names and length."""
+    return (not name or name[0] == ' ' or name[-1] in ' .' or not name.isprintable()
+            or name.split('.', 1)[0].upper().startswith(RESERVED_PREFIXES) or len(name.encode()) > 255)
+
+
+def sanitize_name(filename: str) -> str:
+    """The cleaned version of a filename. Names that are already clean never reach pathvalidate."""
+    cleaned = filename.translate(CLEAN_TABLE) if filename.isascii() else CLEAN_RE.sub('', filename)
+    # pathvalidate can leave a name it would change on a second pass, e.g. "con " -> "con" -> "con_"
+    while _needs_sanitize(cleaned) and (new_name := sanitize_filename(cleaned)) != cleaned:
+        cleaned = new_name
+    return cleaned
+
+
+def plan_clean_filenames(names: Iterable[str]) -> tuple[dict[str, str], list[str]]:
+    """
+    Resolve every rename in memory. Returns {old: new} for the names that change, plus the names left alone
+    because their clean name is empty or already taken by another file or an earlier rename.
+    """
+    names = sorted(names)
+    claimed = set(names)
+    renames: dict[str, str] = {}
+    retained: list[str] = []
+    for name in names:
+        new_name = sanitize_name(name)
+        if new_name == name:
+            continue
+        if new_name in claimed or new_name in ('', '.', '..'):
+            retained.append(name)
+            continue
+        claimed.add(new_name)
+        renames[name] = new_name
+    return renames, retained
+
+
+def clean_filenames(path: Path, names: Iterable[str] | None = None,
+                    dry_run: bool = False) -> tuple[dict[str, str], dict[str, list[str]]]:
+    """
+    Clean the names of the files in `path`, every first-level file when `names` is not given. Renames are
+    planned first and applied in one pass. Returns {old: new} for the files renamed along with the names that
+    were retained or could not be renamed.
+    """
+    if names is None:
+        names = [i.name for i in scan(path, recursive=False, skip_dirs=frozenset(), regular=True)]
+    renames, retained = plan_clean_filenames(names)
+    errors: dict[str, list[str]] = {'retained': retained} if retained else {}
+    if dry_run:
+        return renames, errors
+
+    renamed: dict[str, str] = {}
+    for name, new_name in renames.items():
+        try:
+            os.rename(os.path.join(path, name), os.path.join(path, new_name))
+            renamed[name] = new_name
+        except OSError:
+            errors.setdefault('unrenamed', []).append(name)
+    return renamed, errors
+
 
 def clean_filename(path: Path, filename: str) -> str:
-    new_file = re.sub(r"[^\w\-.\s]", '', sanitize_filename(filename))
-    new_path = os.path.join(path, new_file)
-    fullpath = os.path.join(path, filename)
+    new_file = sanitize_name(filename)
     if new_file != filename:
-        os.rename(fullpath, new_path)
-    return new_file
\ No newline at end of file
+        os.rename(os.path.join(path, filename), os.path.join(path, new_file))
+    return new_file
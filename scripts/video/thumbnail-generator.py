@@ -18,7 +18,7 @@ env_conf = Config(RepositoryEnv('../.env'))
 try:
     SCRIPTS_URL = env_conf('SCRIPTS_URL')
     sys.path.append(SCRIPTS_URL)
-    from utils.utils import command_config, path_config, clean_filename
+    from utils.utils import command_config, path_config, clean_filenames
 except KeyError as e:
     sys.exit(1)
 
@@ -189,9 +189,7 @@ def create_thumbnails(folder_path: Path, thumbnail: str, html: str, title: str,
     thumbnail_path = generate_thumbnail_folder(folder_path, thumbnail)
 
     # Rename
-    files = [i for i in os.listdir(folder_path) if os.path.isfile(i)]
-    for name in files:
-        clean_filename(folder_path, name)
+    clean_filenames(folder_path)
 
     dirnames = sorted(os.listdir(folder_path))
     for file_name in dirnames:
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os, sys, subprocess, click      # noqa
+from pathlib import Path
+
+
+CLI = Path(__file__).resolve().parent / 'vidgrab.py'
+HEAVY = frozenset({'sqlmodel', 'sqlalchemy', 'pydantic', 'decouple', 'dotenv', 'arrow', 'icecream', 'aiosqlite',
+                   'asyncpg'})
+
+
+def import_times(args: list[str]) -> dict[str, tuple[int, int]]:
+    """Run the CLI under -X importtime without VIDGRAB_URL and return {module: (self_us, cumulative_us)}."""
+    env = {k: v for k, v in os.environ.items() if k != 'VIDGRAB_URL'}
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(CLI.parent.parent.parent), env.get('PYTHONPATH')]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', str(CLI), *args], env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise click.ClickException(f'vidgrab {" ".join(args)} failed:\n{result.stderr[-2000:]}')
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line.removeprefix('import time:').split('|')
+        times[name.strip()] = int(self_us), int(cumulative)
+    return times
+
+
+@click.command()
+@click.argument('args', nargs=-1)
+@click.option('--budget', '-b', type=float, default=150, show_default=True,
+              help='Fail if imports take longer than this many milliseconds')
+@click.option('--top', '-t', type=int, default=10, show_default=True, help='Slowest modules to show')
+def main(args: tuple[str], budget: float, top: int):
+    """
+    Check that `vidgrab --help` (or the given ARGS) starts without loading the database stack and within
+    the import time budget. Exits non-zero when either check fails.
+    """
+    times = import_times(list(args) or ['--help'])
+    total = sum(i for i, _ in times.values()) / 1000
+    heavy = sorted(i for i in times if i.split('.')[0] in HEAVY)
+
+    for name, (_, cumulative) in sorted(times.items(), key=lambda x: -x[1][1])[:top]:
+        click.echo(f'{cumulative / 1000:8.1f} ms  {name}')
+    click.echo(f'{total:8.1f} ms  total for {len(times)} modules (budget {budget:g} ms)')
+
+    if heavy:
+        raise click.ClickException(f'Imported at startup: {", ".join(heavy)}')
+    if total > budget:
+        raise click.ClickException(f'Startup imports took {total:.1f} ms, over the {budget:g} ms budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+from datetime import date
+from collections import Counter
+from typing import Iterable
+from sqlmodel import select, insert
+
+from video.vidgrab.models import Video, Status, async_session
+from video.vidgrab.urls import normalize_url, url_domain, url_hash
+from video.vidgrab.whitelist import get_whitelist
+from video.vidgrab.stats import apply_deltas
+
+
+MAX_URL_LENGTH = 255        # Video.url
+IN_CHUNK = 500              # Values per IN (...) query, well below SQLite's parameter limit
+
+
+def chunked(items: list, size: int = IN_CHUNK) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def add_urls(lines: Iterable[str], session_date: date | None = None) -> dict[str, list[str] | int]:
+    """
+    Normalize and dedupe the urls in memory, drop those not in the cached whitelist or already queued, then insert
+    the rest with a single executemany in one transaction.
+    """
+    report: dict[str, list[str] | int] = {'invalid': [], 'duplicate': 0, 'existing': 0, 'not_whitelisted': []}
+
+    urls: dict[str, str] = {}
+    for line in lines:
+        url = normalize_url(line)
+        if url is None or len(url) > MAX_URL_LENGTH:
+            if line.strip() and not line.lstrip().startswith('#'):
+                report['invalid'].append(line.strip())
+        elif url in urls:
+            report['duplicate'] += 1
+        else:
+            urls[url] = url_domain(url)
+
+    async with async_session() as session:
+        async with session.begin():
+            whitelist = await get_whitelist(session)
+            for url, domain in list(urls.items()):
+                if not whitelist.is_allowed(domain):
+                    report['not_whitelisted'].append(url)
+                    del urls[url]
+
+            hashes = {url_hash(url): url for url in urls}
+            existing: set[str] = set()
+            for chunk in chunked(list(hashes)):
+                existing.update(await session.scalars(select(Video.url_hash).where(Video.url_hash.in_(chunk))))
+            report['existing'] = len(existing)
+
+            session_date = session_date or date.today()
+            rows = [dict(url=url, url_hash=key, domain=urls[url], session=session_date, status=Status.pending,
+                         source=urls[url])
+                    for key, url in hashes.items() if key not in existing]
+            if rows:
+                await session.execute(insert(Video), rows)
+                await apply_deltas(session, {session_date: Counter({Status.pending: len(rows)})})
+
+    report['added'] = len(rows)
+    return report
@@ -0,0 +1,32 @@
+"""Add app_whitelist_version
+
+Revision ID: 562bab4ab5bc
+Revises: a837a30b90ba
+Create Date: 2026-10-19 10:03:17.554219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '562bab4ab5bc'
+down_revision: Union[str, None] = 'a837a30b90ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    table = op.create_table('app_whitelist_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(table, [{'id': 1, 'version': 1}])
+
+
+def downgrade() -> None:
+    op.drop_table('app_whitelist_version')
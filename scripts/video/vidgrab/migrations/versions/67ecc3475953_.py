@@ -0,0 +1,50 @@
+"""Add app_session with per-session status counts
+
+Revision ID: 67ecc3475953
+Revises: 562bab4ab5bc
+Create Date: 2026-10-19 11:26:48.310592
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '67ecc3475953'
+down_revision: Union[str, None] = '562bab4ab5bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+STATUSES = ('done', 'pending', 'incomplete', 'pause', 'error')
+
+
+def upgrade() -> None:
+    table = op.create_table('app_session',
+    sa.Column('session', sa.Date(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    *(sa.Column(i, sa.Integer(), nullable=False) for i in STATUSES),
+    sa.Column('downloaded', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('seconds', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('session')
+    )
+
+    # The only full GROUP BY over app_video. From here on ingest and the scheduler keep the counts current.
+    video = sa.table('app_video', sa.column('session', sa.Date), sa.column('status', sa.String))
+    rows: dict = {}
+    for day, status, count in op.get_bind().execute(
+            sa.select(video.c.session, video.c.status, sa.func.count()).group_by(video.c.session, video.c.status)):
+        if day is None:
+            continue
+        row = rows.setdefault(day, dict(session=day, is_active=False, downloaded=0, seconds=0,
+                                        **dict.fromkeys(STATUSES, 0)))
+        row[status] = count
+    if rows:
+        op.bulk_insert(table, list(rows.values()))
+
+
+def downgrade() -> None:
+    op.drop_table('app_session')
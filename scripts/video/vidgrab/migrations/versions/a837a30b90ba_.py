@@ -0,0 +1,100 @@
+"""Index app_video and add url_hash and domain columns
+
+Revision ID: a837a30b90ba
+Revises: 32069a723046
+Create Date: 2026-10-19 09:12:41.201734
+
+"""
+import hashlib
+from typing import Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a837a30b90ba'
+down_revision: Union[str, None] = '32069a723046'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH = 1000
+
+
+# Frozen copies of urls.normalize_url and urls.normalize_domain so this revision never changes with app code
+def _normalize_url(url: str) -> str | None:
+    url = url.strip()
+    if not url or url.startswith('#'):
+        return None
+    if '://' not in url:
+        url = f'https://{url}'
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        netloc = f'{netloc}:{port}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def _domain(value: str) -> str:
+    value = value.strip().lower()
+    if '://' in value:
+        value = urlsplit(value).hostname or ''
+    return value.split('/')[0].rstrip('.').removeprefix('www.')
+
+
+def upgrade() -> None:
+    op.add_column('app_video', sa.Column('url_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+    op.add_column('app_video', sa.Column('domain', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True))
+
+    # Backfill in batches, hashing the normalized url exactly like ingest.add_urls. No row is changed or removed:
+    # a url that repeats an earlier one, or isn't a valid url, keeps a NULL url_hash so the unique index still
+    # builds and downgrade only has to drop the new columns.
+    conn = op.get_bind()
+    video = sa.table('app_video', sa.column('id', sa.Integer), sa.column('url', sa.String),
+                     sa.column('url_hash', sa.String), sa.column('domain', sa.String))
+    seen: set[str] = set()
+    unhashed = 0
+    last_id = 0
+    while rows := conn.execute(sa.select(video.c.id, video.c.url).where(video.c.id > last_id)
+                               .order_by(video.c.id).limit(BATCH)).all():
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            url = _normalize_url(row.url or '')
+            key = url and hashlib.sha256(url.encode()).hexdigest()
+            if not key or key in seen:
+                key = None
+                unhashed += 1
+            else:
+                seen.add(key)
+            updates.append({'_id': row.id, '_hash': key, '_domain': _domain(urlsplit(url or '').hostname or '')})
+        if updates:
+            conn.execute(video.update().where(video.c.id == sa.bindparam('_id'))
+                         .values(url_hash=sa.bindparam('_hash'), domain=sa.bindparam('_domain')), updates)
+    if unhashed:
+        print(f'app_video: {unhashed} duplicate or invalid url(s) left with a NULL url_hash')
+
+    op.create_index('ix_app_video_url_hash', 'app_video', ['url_hash'], unique=True)
+    op.create_index('ix_app_video_domain', 'app_video', ['domain'], unique=False)
+    op.create_index('ix_app_video_status_session', 'app_video', ['status', 'session'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_app_video_status_session', table_name='app_video')
+    op.drop_index('ix_app_video_domain', table_name='app_video')
+    op.drop_index('ix_app_video_url_hash', table_name='app_video')
+    with op.batch_alter_table('app_video') as batch_op:
+        batch_op.drop_column('domain')
+        batch_op.drop_column('url_hash')
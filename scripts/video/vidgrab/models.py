@@ -1,29 +1,28 @@
-import os, sys, sqlalchemy as sa
-from pathlib import Path
+import os, sqlalchemy as sa
 from enum import StrEnum, auto
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from functools import cache
 from datetime import datetime, date
 from sqlmodel import SQLModel, Field, text
 from sqlmodel.ext.asyncio.session import AsyncSession
-from icecream import IceCreamDebugger
-from dotenv import load_dotenv
 
 
+@cache
+def get_engine():
+    """Created on first use so importing the models never needs VIDGRAB_URL or a driver."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    if not (url := os.environ.get('VIDGRAB_URL')):
+        raise RuntimeError('VIDGRAB_URL is not set')
+    return create_async_engine(url)
 
 
+@cache
+def get_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    return async_sessionmaker(bind=get_engine(), expire_on_commit=False, class_=AsyncSession)   # noqa
 
-ic = IceCreamDebugger(prefix='')
-# path = Path(__file__).resolve().parent.parent.parent
-# load_dotenv(dotenv_path=os.path.join(path, '.env'))
 
-DATABASE_URL = os.environ.get('VIDGRAB_URL')
-# SCRIPTS_URL = os.environ.get('SCRIPTS_URL')
-# sys.path.append(SCRIPTS_URL)
-
-engine = create_async_engine(DATABASE_URL)
-async_session = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)   # noqa
-Base = declarative_base()
+def async_session() -> AsyncSession:
+    return get_sessionmaker()()
 
 
 class Status(StrEnum):
@@ -37,14 +36,41 @@ class Status(StrEnum):
 class Whitelist(SQLModel, table=True):
     __tablename__ = 'app_whitelist'
     id: int | None = Field(primary_key=True, default=None)
-    url: str = Field(unique=True, nullable=False)
+    url: str = Field(unique=True, nullable=False)      # Domain, see urls.normalize_domain. Older rows may be raw
     is_nsfw: bool = Field(default=False)
 
 
+class WhitelistVersion(SQLModel, table=True):
+    """Single row bumped on every whitelist change so cached copies know when to reload."""
+    __tablename__ = 'app_whitelist_version'
+    id: int = Field(primary_key=True, default=1)
+    version: int = Field(default=0, nullable=False)
+
+
+class SessionStats(SQLModel, table=True):
+    """
+    Per-session counts by Status, kept up to date by ingest and the scheduler as videos change status so listing
+    sessions never scans app_video. One row per session date.
+    """
+    __tablename__ = 'app_session'
+    session: date = Field(sa_column=sa.Column(sa.Date, primary_key=True))
+    is_active: bool = Field(default=False)          # The session `vidgrab run` downloads
+    done: int = Field(default=0)
+    pending: int = Field(default=0)
+    incomplete: int = Field(default=0)
+    pause: int = Field(default=0)
+    error: int = Field(default=0)
+    downloaded: int = Field(default=0, sa_column=sa.Column(sa.BigInteger, nullable=False, server_default='0'))
+    seconds: float = Field(default=0)               # Scheduler time spent on this session
+
+
 class Video(SQLModel, table=True):
     __tablename__ = 'app_video'
+    __table_args__ = (sa.Index('ix_app_video_status_session', 'status', 'session'),)
     id: int | None = Field(primary_key=True, default=None)
     url: str = Field(max_length=255)
+    url_hash: str | None = Field(max_length=64, unique=True, index=True)   # sha256 of the normalized url
+    domain: str | None = Field(max_length=255, index=True)                 # host without www.
     session: date = Field(sa_column=sa.Column(sa.Date))
     status: Status = Field(max_length=20)
     source: str | None = Field(max_length=90)
@@ -0,0 +1,178 @@
+import os, time, asyncio, urllib.error, urllib.request      # noqa
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from collections import defaultdict, Counter
+from urllib.parse import urlsplit
+from sqlmodel import select, update, func
+
+from video.vidgrab.models import Video, Status, async_session
+from video.vidgrab.stats import apply_deltas
+
+
+CHUNK_SIZE = 1 << 20
+
+
+class Downloader(ABC):
+    """Fetch a url into dest, appending from byte `offset` when a partial file already exists."""
+
+    @abstractmethod
+    async def fetch(self, url: str, dest: Path, offset: int = 0):
+        ...
+
+
+class HttpDownloader(Downloader):
+    """Plain HTTP(S) with Range requests. The blocking transfer runs in a worker thread."""
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+
+    async def fetch(self, url: str, dest: Path, offset: int = 0):
+        await asyncio.to_thread(self._fetch, url, dest, offset)
+
+    def _fetch(self, url: str, dest: Path, offset: int):
+        request = urllib.request.Request(url, headers={'Range': f'bytes={offset}-'} if offset else {})
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # 416 for a .part that already holds the whole file: nothing left to fetch
+            if e.code == 416 and offset and self._length(url, e.headers) == offset:
+                return
+            raise
+        with response:
+            # 200 means the server ignored the range, so start over
+            mode = 'ab' if offset and response.status == 206 else 'wb'
+            with open(dest, mode) as f:
+                while chunk := response.read(CHUNK_SIZE):
+                    f.write(chunk)
+
+    def _length(self, url: str, headers) -> int | None:
+        """Full size of the file, from a 416's Content-Range ("bytes */1234") or else a HEAD request."""
+        content_range = headers.get('Content-Range') or ''
+        if content_range.startswith('bytes */') and content_range[8:].isdigit():
+            return int(content_range[8:])
+        try:
+            request = urllib.request.Request(url, method='HEAD')
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                length = response.headers.get('Content-Length')
+        except OSError:
+            return None
+        return int(length) if length and length.isdigit() else None
+
+
+class FakeDownloader(Downloader):
+    """Writes `size` bytes per url without touching the network. Urls in `fail` raise instead."""
+
+    def __init__(self, size: int = 1024, fail: set[str] | None = None, delay: float = 0):
+        self.size = size
+        self.fail = fail or set()
+        self.delay = delay
+        self.calls: list[tuple[str, int]] = []
+
+    async def fetch(self, url: str, dest: Path, offset: int = 0):
+        self.calls.append((url, offset))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if url in self.fail:
+            raise IOError(f'Failed to fetch {url}')
+        with open(dest, 'ab' if offset else 'wb') as f:
+            f.write(b'\0' * (self.size - offset))
+
+
+def part_path(dest_dir: Path, video: Video) -> Path:
+    name = os.path.basename(urlsplit(video.url).path) or 'video'
+    return dest_dir / f'{video.id}-{name}.part'
+
+
+class Scheduler:
+    """
+    Pulls pending and incomplete videos in batches and downloads them with a global concurrency limit plus a
+    per-source limit. Status changes are buffered and written with one UPDATE per status every `commit_every`
+    results instead of one commit per video. The same flush moves the session counts in app_session.
+    """
+
+    def __init__(self, downloader: Downloader, dest_dir: Path, concurrency: int = 4, per_domain: int = 2,
+                 batch_size: int = 100, commit_every: int = 20):
+        self.downloader = downloader
+        self.dest_dir = Path(dest_dir)
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.limit = asyncio.Semaphore(concurrency)
+        self.domain_limits: dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(per_domain))
+        self.updates: dict[Status, list[int]] = defaultdict(list)
+        self.counts: dict[Status, int] = defaultdict(int)
+        self.transitions: dict[date, Counter] = defaultdict(Counter)
+        self.downloaded: dict[date, int] = defaultdict(int)
+        self._flushed_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def next_batch(self, after: int, session_date: date | None) -> list[Video]:
+        stmt = (select(Video)
+                .where(Video.status.in_([Status.pending, Status.incomplete]), Video.id > after)
+                .order_by(Video.id)
+                .limit(self.batch_size))
+        if session_date:
+            stmt = stmt.where(Video.session == session_date)
+        async with async_session() as session:
+            return list((await session.exec(stmt)).all())
+
+    async def flush(self):
+        async with self._lock:
+            updates, self.updates = self.updates, defaultdict(list)
+            transitions, self.transitions = self.transitions, defaultdict(Counter)
+            downloaded, self.downloaded = self.downloaded, defaultdict(int)
+            now = time.monotonic()
+            elapsed, self._flushed_at = now - self._flushed_at, now
+            if not updates:
+                return
+            seconds = {day: elapsed for day in transitions}
+            async with async_session() as session:
+                async with session.begin():
+                    for status, ids in updates.items():
+                        await session.execute(update(Video).where(Video.id.in_(ids))
+                                              .values(status=status, updated_at=func.now()))
+                    await apply_deltas(session, transitions, downloaded, seconds)
+
+    def track(self, video: Video, status: Status):
+        self.updates[status].append(video.id)
+        # Rows from before app_session existed can have no session, they are not counted anywhere
+        if status != video.status and video.session is not None:
+            self.transitions[video.session][video.status] -= 1
+            self.transitions[video.session][status] += 1
+
+    async def record(self, video: Video, status: Status):
+        self.track(video, status)
+        self.counts[status] += 1
+        if sum(map(len, self.updates.values())) >= self.commit_every:
+            await self.flush()
+
+    async def process(self, video: Video):
+        # Wait for the domain before taking a global slot, so a saturated domain never holds slots others could use
+        async with self.domain_limits[video.domain or video.source or urlsplit(video.url).hostname], self.limit:
+            part = part_path(self.dest_dir, video)
+            offset = part.stat().st_size if part.exists() else 0
+            try:
+                await self.downloader.fetch(video.url, part, offset)
+                if video.session is not None:
+                    self.downloaded[video.session] += part.stat().st_size - offset
+                part.rename(part.with_suffix(''))
+                status = Status.done
+            except asyncio.CancelledError:
+                # Keep the partial file, the next run continues from its size
+                self.track(video, Status.incomplete)
+                raise
+            except Exception:   # noqa
+                status = Status.incomplete if part.exists() and part.stat().st_size else Status.error
+        await self.record(video, status)
+
+    async def run(self, session_date: date | None = None) -> dict[Status, int]:
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        self._flushed_at = time.monotonic()
+        last_id = 0
+        try:
+            while batch := await self.next_batch(last_id, session_date):
+                last_id = batch[-1].id
+                await asyncio.gather(*(self.process(i) for i in batch))
+        finally:
+            await self.flush()
+        return dict(self.counts)
@@ -0,0 +1,61 @@
+from datetime import date
+from collections import Counter
+from sqlmodel import select, update
+
+from video.vidgrab.models import SessionStats, Status
+
+
+async def apply_deltas(session, counts: dict[date, Counter], downloaded: dict[date, int] | None = None,
+                       seconds: dict[date, float] | None = None):
+    """
+    Add per-session status deltas to app_session, e.g. {day: Counter({Status.pending: -1, Status.done: 1})}.
+    Runs inside the caller's transaction so the counts move together with the app_video rows.
+    """
+    downloaded, seconds = downloaded or {}, seconds or {}
+    for day in counts.keys() | downloaded.keys() | seconds.keys():
+        if day is None:
+            continue
+        deltas = {str(status): n for status, n in counts.get(day, {}).items() if n}
+        if downloaded.get(day):
+            deltas['downloaded'] = downloaded[day]
+        if seconds.get(day):
+            deltas['seconds'] = seconds[day]
+        if not deltas:
+            continue
+        values = {key: getattr(SessionStats, key) + n for key, n in deltas.items()}
+        result = await session.execute(update(SessionStats).where(SessionStats.session == day).values(**values))
+        if not result.rowcount:
+            session.add(SessionStats(session=day, **deltas))
+            await session.flush()
+
+
+async def list_sessions(session, limit: int | None = None) -> list[SessionStats]:
+    stmt = select(SessionStats).order_by(SessionStats.session.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    return list((await session.exec(stmt)).all())
+
+
+async def active_session(session) -> date | None:
+    return (await session.exec(select(SessionStats.session).where(SessionStats.is_active))).first()
+
+
+async def activate(session, day: date | None):
+    """Make `day` the session the scheduler works on. None clears it so every session is downloaded."""
+    await session.execute(update(SessionStats).where(SessionStats.is_active).values(is_active=False))
+    if day is None:
+        return
+    result = await session.execute(update(SessionStats).where(SessionStats.session == day).values(is_active=True))
+    if not result.rowcount:
+        session.add(SessionStats(session=day, is_active=True))
+
+
+def throughput(stats: SessionStats) -> tuple[float, float]:
+    """Videos per hour and MB per second over the time the scheduler spent on the session."""
+    if not stats.seconds:
+        return 0.0, 0.0
+    return stats.done * 3600 / stats.seconds, stats.downloaded / stats.seconds / (1 << 20)
+
+
+def total(stats: SessionStats) -> int:
+    return sum(getattr(stats, str(i)) for i in Status)
@@ -0,0 +1,47 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url: str) -> str | None:
+    """Canonical form used for deduping. Returns None for anything that isn't an http(s) url."""
+    url = url.strip()
+    if not url or url.startswith('#'):
+        return None
+    if '://' not in url:
+        url = f'https://{url}'
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        netloc = f'{netloc}:{port}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def normalize_domain(domain: str) -> str:
+    """Form stored in app_whitelist.url and app_video.domain so both are compared with plain equality."""
+    domain = domain.strip().lower()
+    if '://' in domain:
+        domain = urlsplit(domain).hostname or ''
+    return domain.split('/')[0].rstrip('.').removeprefix('www.')
+
+
+def url_domain(url: str) -> str:
+    return normalize_domain(urlsplit(url).hostname or '')
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def domain_candidates(domain: str) -> list[str]:
+    """The domain and every parent, so a whitelisted example.com also covers m.example.com"""
+    labels = domain.split('.')
+    return ['.'.join(labels[i:]) for i in range(len(labels) - 1)]
@@ -1,37 +1,30 @@
 #!/usr/bin/env python3
 
-import click, os, sys, asyncio, arrow
-from enum import StrEnum, auto
-from icecream import IceCreamDebugger
-from sqlmodel import select
+import click, os, sys     # noqa
 from datetime import datetime
 from pathlib import Path
-from decouple import Config, RepositoryEnv
 
+from utils.utils import command_config, group_config
 
-env_conf = Config(RepositoryEnv('../../.env'))
-
-try:
-    # path = Path(__file__).resolve().parent.parent.parent    # scripts/scripts
-    # load_dotenv(dotenv_path=os.path.join(path, '.env'))
-    # sys.path.append(os.environ.get('SCRIPTS_URL'))
-    # sys.path.append(config('SCRIPTS_URL'))
-
-    from utils.utils import command_config, group_config
-except KeyError as e:
-    sys.exit(1)
 
 __version__ = '0.1.0'
 __prog_name__ = 'Vidgrab'
-ic = IceCreamDebugger(prefix='')
+ENV_FILE = Path(__file__).resolve().parent.parent.parent / '.env'     # scripts/.env
+
+# Only stdlib, click and utils load at startup. Shell completion and --help run this often, so sqlmodel,
+# SQLAlchemy, decouple and asyncio are imported inside the subcommands that need them. Guarded by importtime.py.
 
-try:
-    SCRIPTS_URL = env_conf('SCRIPTS_URL')
-    sys.path.append(SCRIPTS_URL)
 
-    from video.vidgrab.models import Video, async_session, Status
-except KeyError as e:
-    ic(e)
+def setup_db():
+    """Read .env and put SCRIPTS_URL on sys.path. Called by every subcommand that touches the database."""
+    from decouple import Config, RepositoryEnv, RepositoryEmpty, UndefinedValueError
+    env_conf = Config(RepositoryEnv(str(ENV_FILE)) if ENV_FILE.exists() else RepositoryEmpty())
+    try:
+        os.environ.setdefault('VIDGRAB_URL', env_conf('VIDGRAB_URL'))
+        if (scripts_url := env_conf('SCRIPTS_URL', default=None)) and scripts_url not in sys.path:
+            sys.path.append(scripts_url)
+    except UndefinedValueError as e:
+        raise click.ClickException(str(e))
 
 
 @click.group(**group_config, invoke_without_command=True)
@@ -40,39 +33,114 @@ def cli():
     pass
 
 
-@cli.command(**group_config, help='Add urls')
-def add():
-    pass
-
-
-@cli.command(**command_config, help='Show active sessions')
-@click.option('--activate', '-a', help='Activate session based on its ID', type=click.BOOL, default=False)
-def session(activate: bool):
-    # List active sessions
-    pass
-
-
-@cli.command(**command_config, help='Show whitelisted domains')
+@cli.command(**command_config, help='Add urls')
+@click.argument('urls', nargs=-1)
+@click.option('--file', '-f', 'files', type=click.File('r'), multiple=True,
+              help='Read urls from a file, one per line. Use - for stdin')
+def add(urls: tuple[str], files: tuple):
+    setup_db()
+    import asyncio
+    from video.vidgrab.ingest import add_urls
+
+    lines = list(urls)
+    for f in files:
+        lines.extend(f)
+    if not urls and not files and not sys.stdin.isatty():
+        lines.extend(sys.stdin)
+    if not lines:
+        raise click.UsageError('No urls given')
+
+    report = asyncio.run(add_urls(lines))
+    for url in report['invalid']:
+        click.echo(f'Invalid: {url}', err=True)
+    for url in report['not_whitelisted']:
+        click.echo(f'Not whitelisted: {url}', err=True)
+    click.echo(f"Added {report['added']} url(s). Skipped {report['existing']} already queued and "
+               f"{report['duplicate']} duplicate(s).")
+
+
+@cli.command(**command_config, help='Download queued videos')
+@click.option('--dest', '-d', type=click.Path(file_okay=False, path_type=Path), default='.', show_default=True,
+              help='Folder to save downloads in')
+@click.option('--concurrency', '-c', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Downloads running at the same time')
+@click.option('--per-domain', type=click.IntRange(min=1), default=2, show_default=True,
+              help='Downloads running at the same time per source')
+def run(dest: Path, concurrency: int, per_domain: int):
+    setup_db()
+    import asyncio
+    from video.vidgrab.models import async_session
+    from video.vidgrab.scheduler import Scheduler, HttpDownloader
+    from video.vidgrab.stats import active_session
+
+    async def _run():
+        async with async_session() as db:
+            current = await active_session(db)
+        if current:
+            click.echo(f'Session {current}')
+        scheduler = Scheduler(HttpDownloader(), dest, concurrency=concurrency, per_domain=per_domain)
+        return await scheduler.run(current)
+
+    counts = asyncio.run(_run())
+    click.echo(', '.join(f'{status}: {total}' for status, total in counts.items()) or 'Nothing to download')
+
+
+@cli.command(**command_config, help='Show sessions and their progress')
+@click.option('--activate', '-a', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Make this session (YYYY-MM-DD) the one `run` downloads')
+@click.option('--clear', is_flag=True, help='Clear the active session so `run` downloads every session')
+@click.option('--limit', '-n', type=click.IntRange(min=0), default=20, show_default=True,
+              help='Most recent sessions to show. 0 shows all')
+def session(activate: datetime | None, clear: bool, limit: int):
+    setup_db()
+    import asyncio
+    from video.vidgrab.models import async_session, Status
+    from video.vidgrab import stats
+
+    async def _run():
+        async with async_session() as db:
+            if activate or clear:
+                async with db.begin():
+                    await stats.activate(db, activate.date() if activate else None)
+            return await stats.list_sessions(db, limit)
+
+    rows = asyncio.run(_run())
+    if not rows:
+        click.echo('No sessions')
+        return
+    click.echo(f"  {'session':<10}" + ''.join(f'{i:>11}' for i in Status) + f"{'total':>9}{'videos/h':>10}{'MB/s':>8}")
+    for row in rows:
+        per_hour, mb_per_sec = stats.throughput(row)
+        click.echo(f"{'*' if row.is_active else ' '} {row.session.isoformat():<10}"
+                   + ''.join(f'{getattr(row, i):>11}' for i in Status)
+                   + f'{stats.total(row):>9}{per_hour:>10.1f}{mb_per_sec:>8.2f}')
+
+
+@cli.command(**command_config, help='Show or edit whitelisted domains')
 @click.argument('urls', nargs=-1)
-@click.option('-l', type=click.BOOL, help='List all whitelisted domains', default=False)
-def whitelist(urls: tuple[str], l: bool):  # noqa
-    ic(l)
-
-
-# async def main():
-#     async with async_session() as session:
-#         # now = arrow.utcnow()
-#         # vid = Video(url='https://foo.bar', session=now.date(), status=Status.done, source='foo.bar')
-#         # session.add(vid)
-#         # await session.commit()
-#         # await session.refresh(vid)
-#         # ic(vid)
-#
-#         stmt = select(Video)
-#         execdata = await session.exec(stmt)
-#         ic(execdata.all())
-#         # for i in execdata.all():
-#         #     ic(i.model_dump())
+@click.option('-l', is_flag=True, help='List all whitelisted domains')
+@click.option('--remove', '-r', is_flag=True, help='Remove the given domains instead of adding them')
+@click.option('--nsfw', is_flag=True, help='Mark added domains as NSFW')
+def whitelist(urls: tuple[str], l: bool, remove: bool, nsfw: bool):  # noqa
+    setup_db()
+    import asyncio
+    from video.vidgrab.models import async_session
+    from video.vidgrab.whitelist import get_whitelist, add_domains, remove_domains
+
+    async def _run():
+        async with async_session() as session:
+            async with session.begin():
+                if urls and remove:
+                    click.echo(f'Removed {await remove_domains(session, urls)} domain(s)')
+                elif urls:
+                    for domain in await add_domains(session, urls, nsfw):
+                        click.echo(f'Added {domain}')
+            if l or not urls:
+                cache = await get_whitelist(session)
+                for domain, is_nsfw in sorted(cache.domains.items()):
+                    click.echo(f'{domain} (nsfw)' if is_nsfw else domain)
+
+    asyncio.run(_run())
 
 
 if __name__ == '__main__':
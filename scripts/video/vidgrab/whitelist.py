@@ -0,0 +1,90 @@
+from typing import Iterable
+from sqlmodel import select, update, delete, insert
+
+from video.vidgrab.models import Whitelist, WhitelistVersion
+from video.vidgrab.urls import normalize_domain, domain_candidates
+
+
+class WhitelistCache:
+    """
+    Whitelisted domains held in memory as a suffix map of domain -> is_nsfw. A lookup walks the domain's parents,
+    so an entry for example.com also matches m.example.com. The map is reloaded only when the version row in
+    app_whitelist_version has moved since the last load.
+    """
+
+    def __init__(self):
+        self.domains: dict[str, bool] = {}
+        self.version: int | None = None
+
+    async def refresh(self, session) -> bool:
+        """Reload if stale. Costs one single-row query when nothing changed."""
+        version = (await session.exec(select(WhitelistVersion.version))).first() or 0
+        if version == self.version:
+            return False
+        rows = await session.exec(select(Whitelist.url, Whitelist.is_nsfw))
+        # Rows added before urls.normalize_domain existed are normalized here rather than rewritten in the db
+        self.domains = {normalize_domain(url): is_nsfw for url, is_nsfw in rows}
+        self.version = version
+        return True
+
+    def match(self, domain: str) -> str | None:
+        """The whitelisted entry covering this domain, if any"""
+        for candidate in domain_candidates(domain):
+            if candidate in self.domains:
+                return candidate
+        return None
+
+    def is_allowed(self, domain: str) -> bool:
+        return self.match(domain) is not None
+
+    def is_nsfw(self, domain: str) -> bool:
+        entry = self.match(domain)
+        return bool(entry and self.domains[entry])
+
+
+cache = WhitelistCache()
+
+
+async def get_whitelist(session) -> WhitelistCache:
+    await cache.refresh(session)
+    return cache
+
+
+async def bump_version(session):
+    result = await session.execute(update(WhitelistVersion).values(version=WhitelistVersion.version + 1))
+    if not result.rowcount:
+        session.add(WhitelistVersion(id=1, version=1))
+
+
+async def stored_domains(session) -> dict[str, list[int]]:
+    """Normalized domain -> ids of the rows holding it. Older rows may store the same domain in another form."""
+    stored: dict[str, list[int]] = {}
+    for row_id, url in await session.exec(select(Whitelist.id, Whitelist.url)):
+        stored.setdefault(normalize_domain(url), []).append(row_id)
+    return stored
+
+
+async def add_domains(session, domains: Iterable[str], is_nsfw: bool = False) -> list[str]:
+    """Insert the domains not yet whitelisted and invalidate every cache. Returns what was added."""
+    wanted = list(dict.fromkeys(filter(None, map(normalize_domain, domains))))
+    if not wanted:
+        return []
+    existing = await stored_domains(session)
+    added = [i for i in wanted if i not in existing]
+    if added:
+        await session.execute(insert(Whitelist), [dict(url=i, is_nsfw=is_nsfw) for i in added])
+        await bump_version(session)
+    return added
+
+
+async def remove_domains(session, domains: Iterable[str]) -> int:
+    wanted = list(dict.fromkeys(filter(None, map(normalize_domain, domains))))
+    if not wanted:
+        return 0
+    stored = await stored_domains(session)
+    ids = [row_id for i in wanted for row_id in stored.get(i, [])]
+    if not ids:
+        return 0
+    await session.execute(delete(Whitelist).where(Whitelist.id.in_(ids)))
+    await bump_version(session)
+    return len(ids)